@@ -0,0 +1,49 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Tuple
+
+
+class CacheTTL:
+    """
+    Caché LRU acotada con expiración por tiempo.
+
+    Guarda como mucho `max_entradas` valores; al llenarse descarta el menos
+    usado recientemente. Cada entrada caduca `ttl_segundos` después de
+    guardarse. Es segura entre hilos.
+    """
+
+    def __init__(self, max_entradas: int = 10_000, ttl_segundos: float = 5.0) -> None:
+        self.max_entradas = max_entradas
+        self.ttl = ttl_segundos
+        self._datos: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+    def obtener(self, clave: Hashable) -> Tuple[bool, Any]:
+        """Devuelve (encontrado, valor)."""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[0] <= time.monotonic():
+                if entrada is not None:
+                    del self._datos[clave]
+                self.fallos += 1
+                return False, None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return True, entrada[1]
+
+    def guardar(self, clave: Hashable, valor: Any) -> None:
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._datos.clear()
@@ -0,0 +1,330 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from threading import Lock
+from typing import Iterator, List, Optional, Tuple
+
+from .database import IdAllocator, _presupuesto_recorrido
+from .models import Item
+
+# Filas que revisamos de golpe (bajo el lock) al recorrer el store
+_FILAS_POR_TRAMO = 256
+
+# Compactamos los buffers de texto cuando la basura supera esta fracción
+_FRACCION_BASURA_MAX = 0.5
+
+# En put_many, a partir de qué fracción del store reconstruimos los índices
+# ordenando todo en lugar de insertar item a item
+_FRACCION_RECONSTRUIR = 0.125
+
+
+class _BufferTexto:
+    """
+    Cadenas UTF-8 empaquetadas en un único bytearray.
+
+    Cada fila guarda solo (offset, longitud); longitud -1 representa None.
+    Los borrados dejan huecos que se recuperan compactando el buffer.
+    """
+
+    def __init__(self) -> None:
+        self.datos = bytearray()
+        self.offsets = array("q")
+        self.longitudes = array("l")
+        self.basura = 0
+
+    def insertar(self, fila: int, texto: Optional[str]) -> None:
+        if texto is None:
+            self.offsets.insert(fila, 0)
+            self.longitudes.insert(fila, -1)
+            return
+        crudo = texto.encode()
+        self.offsets.insert(fila, len(self.datos))
+        self.longitudes.insert(fila, len(crudo))
+        self.datos += crudo
+
+    def borrar(self, fila: int) -> None:
+        self.basura += max(self.longitudes[fila], 0)
+        del self.offsets[fila]
+        del self.longitudes[fila]
+        if self.basura > len(self.datos) * _FRACCION_BASURA_MAX:
+            self._compactar()
+
+    def crudo(self, fila: int) -> Optional[bytes]:
+        longitud = self.longitudes[fila]
+        if longitud < 0:
+            return None
+        inicio = self.offsets[fila]
+        return bytes(self.datos[inicio:inicio + longitud])
+
+    def texto(self, fila: int) -> Optional[str]:
+        crudo = self.crudo(fila)
+        return None if crudo is None else crudo.decode()
+
+    def _compactar(self) -> None:
+        nuevos = bytearray()
+        for fila, longitud in enumerate(self.longitudes):
+            if longitud < 0:
+                continue
+            inicio = self.offsets[fila]
+            self.offsets[fila] = len(nuevos)
+            nuevos += self.datos[inicio:inicio + longitud]
+        self.datos = nuevos
+        self.basura = 0
+
+
+class ColumnarStore:
+    """
+    Backend en memoria compacto, organizado por columnas.
+
+    En lugar de un objeto `Item` por registro guarda un `array('q')` de IDs
+    (ordenado), un `array('d')` de precios y los textos empaquetados en
+    buffers UTF-8. Los índices secundarios también son arrays: (precio, id)
+    en dos arrays paralelos y los IDs ordenados por nombre. Los modelos
+    `Item` se construyen solo al devolverlos.
+
+    Implementa la misma interfaz que `IndexedStore`, así que puede usarse
+    como segmento de `StripedStore`.
+    """
+
+    def __init__(self, ids: Optional[IdAllocator] = None) -> None:
+        self._ids = array("q")
+        self._precios = array("d")
+        self._nombres = _BufferTexto()
+        self._descripciones = _BufferTexto()
+        # Índice por precio: precios ordenados y sus IDs en paralelo
+        self._idx_precio = array("d")
+        self._idx_precio_ids = array("q")
+        # Índice por nombre: IDs ordenados por (nombre en UTF-8, id)
+        self._idx_nombre = array("q")
+        self.ids = ids or IdAllocator()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, item_id: int) -> bool:
+        return self._fila(item_id) is not None
+
+    def next_id(self) -> int:
+        return self.ids.next_id()
+
+    def _fila(self, item_id: int) -> Optional[int]:
+        fila = bisect_left(self._ids, item_id)
+        if fila < len(self._ids) and self._ids[fila] == item_id:
+            return fila
+        return None
+
+    def _item(self, fila: int) -> Item:
+        return Item(
+            id=self._ids[fila],
+            nombre=self._nombres.texto(fila),
+            descripcion=self._descripciones.texto(fila),
+            precio=self._precios[fila],
+        )
+
+    def _clave_nombre(self, item_id: int) -> Tuple[bytes, int]:
+        return self._nombres.crudo(self._fila(item_id)), item_id
+
+    def _pos_precio(self, precio: float, item_id: int) -> int:
+        lo = bisect_left(self._idx_precio, precio)
+        hi = bisect_right(self._idx_precio, precio, lo)
+        return bisect_left(self._idx_precio_ids, item_id, lo, hi)
+
+    def _pos_nombre(self, nombre: bytes, item_id: int) -> int:
+        return bisect_left(
+            self._idx_nombre, (nombre, item_id), key=self._clave_nombre
+        )
+
+    def get(self, item_id: int) -> Optional[Item]:
+        with self._lock:
+            fila = self._fila(item_id)
+            return None if fila is None else self._item(fila)
+
+    def put(self, item: Item) -> None:
+        with self._lock:
+            if self._fila(item.id) is not None:
+                self._borrar(item.id)
+            self._insertar_fila(item)
+            self._indexar(item)
+        self.ids.observar(item.id)
+
+    def put_many(self, items: List[Item]) -> None:
+        """
+        Inserta un lote de items. Si el lote es grande respecto al store, los
+        índices se reconstruyen ordenando una sola vez.
+        """
+        unicos = {item.id: item for item in items}
+        if not unicos:
+            return
+        with self._lock:
+            for item_id in unicos:
+                if self._fila(item_id) is not None:
+                    self._borrar(item_id)
+            reconstruir = len(unicos) >= len(self._ids) * _FRACCION_RECONSTRUIR
+            for item_id in sorted(unicos):
+                self._insertar_fila(unicos[item_id])
+                if not reconstruir:
+                    self._indexar(unicos[item_id])
+            if reconstruir:
+                self._reconstruir_indices()
+        self.ids.observar(max(unicos))
+
+    def _insertar_fila(self, item: Item) -> None:
+        # Los IDs suelen llegar crecientes: en ese caso la fila va al final
+        if self._ids and item.id < self._ids[-1]:
+            fila = bisect_left(self._ids, item.id)
+        else:
+            fila = len(self._ids)
+        self._ids.insert(fila, item.id)
+        self._precios.insert(fila, item.precio)
+        self._nombres.insertar(fila, item.nombre)
+        self._descripciones.insertar(fila, item.descripcion)
+
+    def _indexar(self, item: Item) -> None:
+        pos = self._pos_precio(item.precio, item.id)
+        self._idx_precio.insert(pos, item.precio)
+        self._idx_precio_ids.insert(pos, item.id)
+        pos = self._pos_nombre(item.nombre.encode(), item.id)
+        self._idx_nombre.insert(pos, item.id)
+
+    def _reconstruir_indices(self) -> None:
+        filas = range(len(self._ids))
+        por_precio = sorted(filas, key=lambda f: (self._precios[f], self._ids[f]))
+        self._idx_precio = array("d", (self._precios[f] for f in por_precio))
+        self._idx_precio_ids = array("q", (self._ids[f] for f in por_precio))
+        por_nombre = sorted(filas, key=lambda f: (self._nombres.crudo(f), self._ids[f]))
+        self._idx_nombre = array("q", (self._ids[f] for f in por_nombre))
+
+    def delete(self, item_id: int) -> bool:
+        with self._lock:
+            if self._fila(item_id) is None:
+                return False
+            self._borrar(item_id)
+        return True
+
+    def cerrar(self) -> None:
+        """En memoria no hay nada que liberar."""
+
+    def _borrar(self, item_id: int) -> None:
+        fila = self._fila(item_id)
+        pos = self._pos_precio(self._precios[fila], item_id)
+        del self._idx_precio[pos]
+        del self._idx_precio_ids[pos]
+        del self._idx_nombre[self._pos_nombre(self._nombres.crudo(fila), item_id)]
+        del self._ids[fila]
+        del self._precios[fila]
+        self._nombres.borrar(fila)
+        self._descripciones.borrar(fila)
+
+    def _rango_candidatos(
+        self,
+        prefijo: Optional[bytes],
+        precio_min: Optional[float],
+        precio_max: Optional[float],
+    ) -> Tuple[int, int, array]:
+        """Rango (lo, hi) del índice más selectivo y sus IDs. Con el lock."""
+        rangos = []
+        if prefijo:
+            lo = self._pos_nombre(prefijo, -1)
+            hi = len(self._idx_nombre)
+            if prefijo[-1] < 0xFF:
+                siguiente = prefijo[:-1] + bytes([prefijo[-1] + 1])
+                hi = self._pos_nombre(siguiente, -1)
+            rangos.append((lo, hi, self._idx_nombre))
+        if precio_min is not None or precio_max is not None:
+            lo = 0 if precio_min is None else bisect_left(self._idx_precio, precio_min)
+            hi = (
+                len(self._idx_precio)
+                if precio_max is None
+                else bisect_right(self._idx_precio, precio_max)
+            )
+            rangos.append((lo, hi, self._idx_precio_ids))
+        return min(rangos, key=lambda r: r[1] - r[0])
+
+    def _cumple(
+        self,
+        fila: int,
+        prefijo: Optional[bytes],
+        precio_min: Optional[float],
+        precio_max: Optional[float],
+    ) -> bool:
+        precio = self._precios[fila]
+        if precio_min is not None and precio < precio_min:
+            return False
+        if precio_max is not None and precio > precio_max:
+            return False
+        return not prefijo or self._nombres.crudo(fila).startswith(prefijo)
+
+    def buscar(
+        self,
+        desde_id: int = 0,
+        nombre_prefijo: Optional[str] = None,
+        precio_min: Optional[float] = None,
+        precio_max: Optional[float] = None,
+        limite: Optional[int] = None,
+    ) -> Iterator[Item]:
+        """
+        Recorre los items en orden de ID, empezando después de `desde_id`,
+        aplicando los filtros indicados.
+
+        Materializa los `Item` por tramos cortos bajo el lock y los entrega
+        fuera de él, así un streaming largo no bloquea las escrituras. Con
+        filtros, `limite` decide entre el índice secundario y el recorrido
+        por ID, como en `IndexedStore`.
+        """
+        prefijo = nombre_prefijo.encode() if nombre_prefijo else None
+        filtra = prefijo is not None or precio_min is not None or precio_max is not None
+
+        # No materializamos más items por tramo de los que se van a consumir,
+        # pero filtrando sí revisamos hasta _FILAS_POR_TRAMO filas por tramo
+        por_tramo = min(limite, _FILAS_POR_TRAMO) if limite else _FILAS_POR_TRAMO
+        presupuesto = None
+        if filtra:
+            with self._lock:
+                lo, hi, _ = self._rango_candidatos(prefijo, precio_min, precio_max)
+                presupuesto = _presupuesto_recorrido(hi - lo, len(self._ids), limite)
+
+        ultimo = desde_id
+        if not filtra or presupuesto is not None:
+            recorridos = encontrados = 0
+            while True:
+                tramo = []
+                with self._lock:
+                    inicio = bisect_right(self._ids, ultimo)
+                    fin = min(inicio + _FILAS_POR_TRAMO, len(self._ids))
+                    fila = inicio
+                    while fila < fin and len(tramo) < por_tramo:
+                        if not filtra or self._cumple(
+                            fila, prefijo, precio_min, precio_max
+                        ):
+                            tramo.append(self._item(fila))
+                        fila += 1
+                    if fila == inicio:
+                        return
+                    ultimo = self._ids[fila - 1]
+                recorridos += fila - inicio
+                encontrados += len(tramo)
+                yield from tramo
+                if presupuesto is not None and (
+                    recorridos >= presupuesto and encontrados < limite
+                ):
+                    break
+
+        # El resto sale del índice, a partir del último ID ya visto
+        with self._lock:
+            lo, hi, indice = self._rango_candidatos(prefijo, precio_min, precio_max)
+            candidatos = sorted(
+                item_id for item_id in indice[lo:hi] if item_id > ultimo
+            )
+        pos = 0
+        while pos < len(candidatos):
+            tramo = []
+            with self._lock:
+                fin = min(pos + _FILAS_POR_TRAMO, len(candidatos))
+                while pos < fin and len(tramo) < por_tramo:
+                    fila = self._fila(candidatos[pos])
+                    if fila is not None and self._cumple(
+                        fila, prefijo, precio_min, precio_max
+                    ):
+                        tramo.append(self._item(fila))
+                    pos += 1
+            yield from tramo
@@ -1,12 +1,447 @@
-from typing import Dict
+import os
+from bisect import bisect_left, bisect_right, insort
+from heapq import merge
+from math import inf
+from operator import attrgetter
+from threading import Lock
+from typing import Callable, Dict, Iterator, List, Optional, Protocol, Tuple
+
 from .models import Item
 
-# "Base de datos" en memoria
-db: Dict[int, Item] = {}
-_auto_id = 0
+# Cuántos IDs copiamos de golpe al recorrer el índice principal
+_IDS_POR_TRAMO = 256
+
+# Cuántas veces el coste esperado dejamos recorrer por ID antes de pasar
+# al índice secundario
+_MARGEN_RECORRIDO = 2
+
+# Striping: número de segmentos (los IDs se reparten por módulo)
+SEGMENTOS_POR_DEFECTO = 16
+
+
+class ItemRepository(Protocol):
+    """Interfaz mínima que usan los endpoints para acceder a los items."""
+
+    ids: "IdAllocator"
+
+    def get(self, item_id: int) -> Optional[Item]:
+        ...
+
+    def put(self, item: Item) -> None:
+        ...
+
+    def put_many(self, items: List[Item]) -> None:
+        ...
+
+    def delete(self, item_id: int) -> bool:
+        ...
+
+    def next_id(self) -> int:
+        ...
+
+    def buscar(
+        self,
+        desde_id: int = 0,
+        nombre_prefijo: Optional[str] = None,
+        precio_min: Optional[float] = None,
+        precio_max: Optional[float] = None,
+        limite: Optional[int] = None,
+    ) -> Iterator[Item]:
+        ...
+
+    def __len__(self) -> int:
+        ...
+
+    def cerrar(self) -> None:
+        ...
+
+
+class IdAllocator:
+    """Generador atómico de IDs compartido por todos los segmentos."""
+
+    def __init__(self, ultimo: int = 0) -> None:
+        self._ultimo = ultimo
+        self._lock = Lock()
+
+    @property
+    def ultimo(self) -> int:
+        return self._ultimo
+
+    def next_id(self) -> int:
+        with self._lock:
+            self._ultimo += 1
+            return self._ultimo
+
+    def reservar(self, cantidad: int) -> range:
+        """Reserva `cantidad` IDs consecutivos de una sola vez."""
+        with self._lock:
+            inicio = self._ultimo + 1
+            self._ultimo += cantidad
+            return range(inicio, self._ultimo + 1)
+
+    def observar(self, item_id: int) -> None:
+        """Evita repartir un ID que ya llegó de fuera (p. ej. al recuperar datos)."""
+        # Camino rápido sin lock: los IDs repartidos aquí nunca lo superan
+        if item_id <= self._ultimo:
+            return
+        with self._lock:
+            if item_id > self._ultimo:
+                self._ultimo = item_id
+
+
+def _quitar(lista: list, clave) -> None:
+    """Borra `clave` de una lista ordenada, comprobando que está donde toca."""
+    pos = bisect_left(lista, clave)
+    if pos == len(lista) or lista[pos] != clave:
+        raise RuntimeError(f"Índice inconsistente: falta {clave!r}")
+    del lista[pos]
+
+
+def _presupuesto_recorrido(
+    candidatos: int, total: int, limite: Optional[int]
+) -> Optional[int]:
+    """
+    Decide entre copiar y ordenar el rango de un índice secundario (coste
+    proporcional a `candidatos`) o recorrer por ID filtrando hasta juntar
+    `limite` items (coste esperado `limite * total / candidatos` si los
+    filtros se reparten de forma uniforme entre los IDs).
+
+    Devuelve cuántos IDs recorrer como mucho, o None si conviene ir directo
+    al índice. Si los resultados se agrupan en un tramo de IDs (p. ej. una
+    importación masiva con el mismo prefijo), el recorrido agota el
+    presupuesto y se pasa al índice: el coste queda acotado a O(candidatos).
+    """
+    if limite is None or limite * total >= candidatos * candidatos:
+        return None
+    return max(_MARGEN_RECORRIDO * limite * total // candidatos, _IDS_POR_TRAMO)
+
+
+def _siguiente_prefijo(prefijo: str) -> Optional[str]:
+    """Menor cadena mayor que todas las que empiezan por `prefijo`."""
+    for i in range(len(prefijo) - 1, -1, -1):
+        if ord(prefijo[i]) < 0x10FFFF:
+            return prefijo[:i] + chr(ord(prefijo[i]) + 1)
+    return None
+
+
+class IndexedStore:
+    """
+    "Base de datos" en memoria con índices secundarios.
+
+    Además del dict por ID mantiene listas ordenadas (con bisect) por ID,
+    por (precio, id) y por (nombre, id), de modo que las consultas por rango
+    de precio o prefijo de nombre cuestan O(log n + k) en lugar de un
+    recorrido completo.
+
+    Las escrituras y las copias de los índices se hacen bajo un lock propio;
+    las lecturas por ID no lo necesitan.
+    """
+
+    def __init__(self, ids: Optional[IdAllocator] = None) -> None:
+        self._items: Dict[int, Item] = {}
+        self._ids: List[int] = []
+        self._por_precio: List[Tuple[float, int]] = []
+        self._por_nombre: List[Tuple[str, int]] = []
+        self.ids = ids or IdAllocator()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._items
+
+    def next_id(self) -> int:
+        return self.ids.next_id()
+
+    def get(self, item_id: int) -> Optional[Item]:
+        return self._items.get(item_id)
+
+    def put(self, item: Item) -> None:
+        with self._lock:
+            anterior = self._items.get(item.id)
+            if anterior is not None:
+                self._quitar_de_indices(anterior)
+            else:
+                insort(self._ids, item.id)
+            self._items[item.id] = item
+            insort(self._por_precio, (item.precio, item.id))
+            insort(self._por_nombre, (item.nombre, item.id))
+        self.ids.observar(item.id)
+
+    def put_many(self, items: List[Item]) -> None:
+        """
+        Inserta un lote de items de una vez: añade al final de los índices y
+        reordena una sola vez (timsort aprovecha los tramos ya ordenados).
+        """
+        unicos = {item.id: item for item in items}
+        if not unicos:
+            return
+        with self._lock:
+            nuevos_ids = []
+            for item in unicos.values():
+                anterior = self._items.get(item.id)
+                if anterior is not None:
+                    self._quitar_de_indices(anterior)
+                else:
+                    nuevos_ids.append(item.id)
+                self._items[item.id] = item
+            self._ids.extend(nuevos_ids)
+            self._ids.sort()
+            self._por_precio.extend((i.precio, i.id) for i in unicos.values())
+            self._por_precio.sort()
+            self._por_nombre.extend((i.nombre, i.id) for i in unicos.values())
+            self._por_nombre.sort()
+        self.ids.observar(max(unicos))
+
+    def delete(self, item_id: int) -> bool:
+        with self._lock:
+            item = self._items.pop(item_id, None)
+            if item is None:
+                return False
+            self._quitar_de_indices(item)
+            _quitar(self._ids, item_id)
+        return True
+
+    def cerrar(self) -> None:
+        """En memoria no hay nada que liberar."""
+
+    def _quitar_de_indices(self, item: Item) -> None:
+        _quitar(self._por_precio, (item.precio, item.id))
+        _quitar(self._por_nombre, (item.nombre, item.id))
+
+    def _rango_nombre(self, prefijo: str) -> Tuple[int, int]:
+        lo = bisect_left(self._por_nombre, (prefijo,))
+        limite = _siguiente_prefijo(prefijo)
+        hi = (
+            len(self._por_nombre)
+            if limite is None
+            else bisect_left(self._por_nombre, (limite,))
+        )
+        return lo, hi
+
+    def _rango_precio(
+        self, precio_min: Optional[float], precio_max: Optional[float]
+    ) -> Tuple[int, int]:
+        lo = 0 if precio_min is None else bisect_left(self._por_precio, (precio_min,))
+        hi = (
+            len(self._por_precio)
+            if precio_max is None
+            else bisect_right(self._por_precio, (precio_max, inf))
+        )
+        return lo, hi
+
+    def _recorrer_ids(self, desde_id: int) -> Iterator[int]:
+        # Copiamos tramos cortos y volvemos a buscar con bisect en cada tramo,
+        # así un streaming largo tolera inserciones y borrados concurrentes.
+        ultimo = desde_id
+        while True:
+            with self._lock:
+                pos = bisect_right(self._ids, ultimo)
+                tramo = self._ids[pos:pos + _IDS_POR_TRAMO]
+            if not tramo:
+                return
+            yield from tramo
+            ultimo = tramo[-1]
+
+    def buscar(
+        self,
+        desde_id: int = 0,
+        nombre_prefijo: Optional[str] = None,
+        precio_min: Optional[float] = None,
+        precio_max: Optional[float] = None,
+        limite: Optional[int] = None,
+    ) -> Iterator[Item]:
+        """
+        Recorre los items en orden de ID, empezando después de `desde_id`,
+        aplicando los filtros indicados.
+
+        Si hay filtros, los candidatos salen del índice más selectivo; si
+        no, se recorre el índice de IDs. `limite` indica cuántos items piensa
+        consumir el llamador: si el rango del índice es mucho mayor, sale más
+        barato recorrer por ID filtrando. Es un generador: no materializa el
+        catálogo completo.
+        """
+        filtra_nombre = bool(nombre_prefijo)
+        filtra_precio = precio_min is not None or precio_max is not None
+
+        def cumple(item: Item) -> bool:
+            if filtra_nombre and not item.nombre.startswith(nombre_prefijo):
+                return False
+            if precio_min is not None and item.precio < precio_min:
+                return False
+            return precio_max is None or item.precio <= precio_max
+
+        if not (filtra_nombre or filtra_precio):
+            for item_id in self._recorrer_ids(desde_id):
+                item = self._items.get(item_id)
+                if item is not None:
+                    yield item
+            return
+
+        with self._lock:
+            lo, hi, _ = self._rango_candidatos(nombre_prefijo, precio_min, precio_max)
+            presupuesto = _presupuesto_recorrido(hi - lo, len(self._ids), limite)
+
+        ultimo = desde_id
+        if presupuesto is not None:
+            recorridos = encontrados = 0
+            for item_id in self._recorrer_ids(desde_id):
+                item = self._items.get(item_id)
+                if item is not None and cumple(item):
+                    encontrados += 1
+                    yield item
+                ultimo = item_id
+                recorridos += 1
+                if recorridos >= presupuesto and encontrados < limite:
+                    break
+            else:
+                return
+
+        # El resto sale del índice, a partir del último ID ya visto
+        with self._lock:
+            lo, hi, indice = self._rango_candidatos(
+                nombre_prefijo, precio_min, precio_max
+            )
+            candidatos = indice[lo:hi]
+        for item_id in sorted(item_id for _, item_id in candidatos if item_id > ultimo):
+            item = self._items.get(item_id)
+            if item is not None and cumple(item):
+                yield item
+
+    def _rango_candidatos(
+        self,
+        nombre_prefijo: Optional[str],
+        precio_min: Optional[float],
+        precio_max: Optional[float],
+    ) -> Tuple[int, int, list]:
+        """Rango (lo, hi) del índice más selectivo y el índice. Con el lock."""
+        rangos = []
+        if nombre_prefijo:
+            rangos.append((*self._rango_nombre(nombre_prefijo), self._por_nombre))
+        if precio_min is not None or precio_max is not None:
+            rangos.append(
+                (*self._rango_precio(precio_min, precio_max), self._por_precio)
+            )
+        return min(rangos, key=lambda r: r[1] - r[0])
+
+
+class StripedStore:
+    """
+    Store concurrente con lock striping por ID.
+
+    Reparte los items en varios segmentos independientes (cada uno con su
+    lock e índices) según `item_id % segmentos`, así los IDs consecutivos
+    de una ráfaga de altas caen en segmentos distintos. Las escrituras sobre
+    segmentos distintos no compiten entre sí; los IDs salen de un único
+    `IdAllocator` atómico compartido.
+    """
+
+    def __init__(
+        self,
+        segmentos: int = SEGMENTOS_POR_DEFECTO,
+        fabrica: Callable[[IdAllocator], ItemRepository] = IndexedStore,
+    ) -> None:
+        self.ids = IdAllocator()
+        self._segmentos = [fabrica(self.ids) for _ in range(segmentos)]
+
+    def _n_segmento(self, item_id: int) -> int:
+        return item_id % len(self._segmentos)
+
+    def _segmento(self, item_id: int) -> ItemRepository:
+        return self._segmentos[self._n_segmento(item_id)]
+
+    def __len__(self) -> int:
+        return sum(len(segmento) for segmento in self._segmentos)
+
+    def next_id(self) -> int:
+        return self.ids.next_id()
+
+    def get(self, item_id: int) -> Optional[Item]:
+        return self._segmento(item_id).get(item_id)
+
+    def put(self, item: Item) -> None:
+        self._segmento(item.id).put(item)
+
+    def put_many(self, items: List[Item]) -> None:
+        por_segmento: Dict[int, List[Item]] = {}
+        for item in items:
+            por_segmento.setdefault(self._n_segmento(item.id), []).append(item)
+        for n, lote in por_segmento.items():
+            self._segmentos[n].put_many(lote)
+
+    def delete(self, item_id: int) -> bool:
+        return self._segmento(item_id).delete(item_id)
+
+    def cerrar(self) -> None:
+        for segmento in self._segmentos:
+            segmento.cerrar()
+
+    def buscar(
+        self,
+        desde_id: int = 0,
+        nombre_prefijo: Optional[str] = None,
+        precio_min: Optional[float] = None,
+        precio_max: Optional[float] = None,
+        limite: Optional[int] = None,
+    ) -> Iterator[Item]:
+        """
+        Mezcla en orden de ID los resultados de cada segmento.
+
+        Con IDs repartidos por módulo, a cada segmento le toca más o menos
+        su parte de `limite`; si necesita más, simplemente sigue generando.
+        """
+        por_segmento = None
+        if limite is not None:
+            por_segmento = -(-limite // len(self._segmentos)) + 1
+        return merge(
+            *(
+                segmento.buscar(
+                    desde_id, nombre_prefijo, precio_min, precio_max, por_segmento
+                )
+                for segmento in self._segmentos
+            ),
+            key=attrgetter("id"),
+        )
+
+
+def crear_store(
+    backend: str = "indexado", directorio: Optional[str] = None
+) -> ItemRepository:
+    """
+    Crea el store según el backend elegido:
+
+    - "indexado": objetos `Item` en dicts con índices en listas ordenadas.
+    - "columnar": columnas en arrays compactos; mucha menos memoria por item
+      a cambio de construir los `Item` en cada lectura.
+
+    Si se indica `directorio`, el store se hace persistente (WAL + snapshots)
+    con la política de sync de `ITEMS_WAL_SYNC` ("grupo" o "siempre").
+    """
+    if backend == "indexado":
+        store: ItemRepository = StripedStore()
+    elif backend == "columnar":
+        from .columnar import ColumnarStore
+
+        store = StripedStore(fabrica=ColumnarStore)
+    else:
+        raise ValueError(f"Backend de store desconocido: {backend!r}")
+
+    if directorio:
+        from .persistencia import PersistentStore
+
+        store = PersistentStore(
+            store,
+            directorio,
+            modo_sync=os.getenv("ITEMS_WAL_SYNC", "grupo"),
+            ventana_ms=float(os.getenv("ITEMS_WAL_VENTANA_MS", "0")),
+            snapshot_cada=int(os.getenv("ITEMS_SNAPSHOT_CADA", "100000")),
+        )
+    return store
 
 
-def get_next_id() -> int:
-    global _auto_id
-    _auto_id += 1
-    return _auto_id
+# "Base de datos" en memoria (persistente si se define ITEMS_DATA_DIR)
+db: ItemRepository = crear_store(
+    os.getenv("ITEMS_STORE_BACKEND", "indexado"),
+    directorio=os.getenv("ITEMS_DATA_DIR"),
+)
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+
+class FlagProvider(ABC):
+    """
+    Origen de los feature flags.
+
+    Expone la misma API que usábamos del cliente de LaunchDarkly
+    (`variation`, `is_initialized`, `close`) pero evaluando por la key del
+    usuario, para poder cambiar de proveedor sin tocar los endpoints.
+    """
+
+    nombre = "base"
+
+    def __init__(self, inicio: Optional[float] = None) -> None:
+        # Referencia (perf_counter) desde la que medimos el arranque
+        self._inicio = time.perf_counter() if inicio is None else inicio
+        self._listo_en: Optional[float] = None
+
+    @abstractmethod
+    def variation(self, flag: str, user_key: str, default: Any) -> Any:
+        """Valor del flag para el usuario, o `default` si no se puede evaluar."""
+
+    def is_initialized(self) -> bool:
+        return self._listo_en is not None
+
+    def _marcar_listo(self) -> None:
+        if self._listo_en is None:
+            self._listo_en = time.perf_counter()
+
+    def segundos_hasta_listo(self) -> Optional[float]:
+        if self._listo_en is None:
+            return None
+        return round(self._listo_en - self._inicio, 4)
+
+    def estado(self) -> Dict[str, Any]:
+        return {
+            "proveedor": self.nombre,
+            "inicializado": self.is_initialized(),
+            "segundos_hasta_listo": self.segundos_hasta_listo(),
+        }
+
+    def close(self) -> None:
+        pass
+
+
+class LaunchDarklyProvider(FlagProvider):
+    """
+    Flags desde LaunchDarkly, con la inicialización del SDK en segundo plano.
+
+    El arranque del worker no espera a la conexión con LaunchDarkly: hasta
+    que el SDK está listo, `variation` devuelve el valor por defecto.
+    """
+
+    nombre = "launchdarkly"
+
+    def __init__(self, sdk_key: str, inicio: Optional[float] = None) -> None:
+        super().__init__(inicio)
+        self.sdk_key = sdk_key
+        self._cliente = None
+        # Un close() durante la inicialización lo completa el propio hilo
+        self._lock = threading.Lock()
+        self._cerrado = False
+        self._hilo = threading.Thread(
+            target=self._inicializar, name="launchdarkly-init", daemon=True
+        )
+        self._hilo.start()
+
+    def _inicializar(self) -> None:
+        import ldclient
+        from ldclient.config import Config
+
+        # Configuramos el cliente de LaunchDarkly (bloquea hasta start_wait)
+        ldclient.set_config(Config(self.sdk_key))
+        cliente = ldclient.get()
+        with self._lock:
+            if self._cerrado:
+                cliente.close()
+                return
+            self._cliente = cliente
+
+        if self._cliente.is_initialized():
+            self._marcar_listo()
+            print(
+                "[LaunchDarkly] Cliente inicializado correctamente ✅ "
+                f"({self.segundos_hasta_listo()} s desde el arranque)"
+            )
+        else:
+            print("[LaunchDarkly] Cliente NO inicializado ❌")
+
+    def is_initialized(self) -> bool:
+        if self._listo_en is None and self._cliente is not None:
+            # El SDK sigue reintentando: puede terminar de conectar más tarde
+            if self._cliente.is_initialized():
+                self._marcar_listo()
+        return super().is_initialized()
+
+    def variation(self, flag: str, user_key: str, default: Any) -> Any:
+        if not self.is_initialized():
+            return default
+
+        from ldclient import Context  # 👈 USAMOS CONTEXT, NO DICT
+
+        # 👇 CONTEXTO UNIFICADO (SDK 8+)
+        # Creamos un contexto de tipo "user" con la key del usuario
+        return self._cliente.variation(flag, Context.create(user_key), default)
+
+    def close(self) -> None:
+        with self._lock:
+            self._cerrado = True
+            cliente = self._cliente
+        if cliente is not None:
+            cliente.close()
+
+
+class LocalFlagProvider(FlagProvider):
+    """
+    Flags evaluados en local, desde memoria o desde un archivo JSON.
+
+    Pensado para tests y entornos sin acceso a LaunchDarkly. Cada flag es
+    un objeto con reglas que se aplican en este orden:
+
+        {
+          "new-pricing-strategy": {
+            "usuarios": {"user-123": true},
+            "porcentaje": {"peso": 25, "valor": true},
+            "valor": false
+          }
+        }
+
+    - `usuarios`: valor fijo para keys concretas.
+    - `porcentaje`: `valor` para un `peso`% estable de los usuarios.
+    - `valor`: valor para el resto.
+
+    Si hay archivo, se recarga en caliente cuando cambia (se comprueba como
+    mucho cada `intervalo_recarga` segundos).
+    """
+
+    nombre = "local"
+
+    def __init__(
+        self,
+        flags: Optional[Dict[str, Any]] = None,
+        ruta: Optional[str] = None,
+        intervalo_recarga: float = 1.0,
+        inicio: Optional[float] = None,
+    ) -> None:
+        super().__init__(inicio)
+        self.ruta = ruta
+        self._flags: Dict[str, Any] = dict(flags or {})
+        self._intervalo = intervalo_recarga
+        self._mtime: Optional[float] = None
+        self._proxima_revision = 0.0
+        self._lock = threading.Lock()
+        if ruta:
+            self._recargar_si_cambio()
+        self._marcar_listo()
+
+    def establecer(self, flag: str, regla: Any) -> None:
+        """Define o sustituye un flag en memoria (útil en tests)."""
+        if not isinstance(regla, dict):
+            regla = {"valor": regla}
+        self._flags[flag] = regla
+
+    def _recargar_si_cambio(self) -> None:
+        ahora = time.monotonic()
+        if ahora < self._proxima_revision:
+            return
+        with self._lock:
+            if ahora < self._proxima_revision:
+                return
+            self._proxima_revision = ahora + self._intervalo
+            try:
+                mtime = os.stat(self.ruta).st_mtime
+                if mtime == self._mtime:
+                    return
+                with open(self.ruta, encoding="utf-8") as f:
+                    flags = json.load(f)
+            except (OSError, ValueError) as e:
+                # Nos quedamos con la última versión válida
+                print(f"[Flags] No se pudo cargar {self.ruta}: {e}")
+                return
+            self._flags = flags
+            self._mtime = mtime
+            print(f"[Flags] Flags cargados desde {self.ruta} ({len(flags)} flags)")
+
+    def variation(self, flag: str, user_key: str, default: Any) -> Any:
+        if self.ruta:
+            self._recargar_si_cambio()
+        regla = self._flags.get(flag)
+        if regla is None:
+            return default
+        if not isinstance(regla, dict):
+            return regla
+
+        usuarios = regla.get("usuarios") or {}
+        if user_key in usuarios:
+            return usuarios[user_key]
+
+        porcentaje = regla.get("porcentaje")
+        if porcentaje:
+            resumen = hashlib.sha1(f"{flag}.{user_key}".encode()).digest()
+            if int.from_bytes(resumen[:4], "big") % 100 < porcentaje.get("peso", 0):
+                return porcentaje.get("valor", default)
+
+        return regla.get("valor", default)
+
+    def estado(self) -> Dict[str, Any]:
+        estado = super().estado()
+        estado["archivo"] = self.ruta
+        return estado
+
+
+def crear_proveedor_flags(inicio: Optional[float] = None) -> FlagProvider:
+    """
+    Elige el proveedor según `FLAGS_PROVIDER` ("launchdarkly" o "local").
+
+    Por defecto se usa LaunchDarkly, que exige `LAUNCHDARKLY_SDK_KEY`: sin
+    ella preferimos fallar al arrancar a servir en silencio los valores por
+    defecto. Los flags locales (desde `FLAGS_FILE` si está definido) se
+    usan solo si se piden de forma explícita.
+    """
+    sdk_key = os.getenv("LAUNCHDARKLY_SDK_KEY")
+    proveedor = os.getenv("FLAGS_PROVIDER") or "launchdarkly"
+
+    if proveedor == "launchdarkly":
+        if not sdk_key:
+            raise RuntimeError(
+                "[LaunchDarkly] ERROR: LAUNCHDARKLY_SDK_KEY no está definida en las "
+                "variables de entorno. Verifica el Secret de Kubernetes "
+                "(launchdarkly-secret) y el Deployment."
+            )
+        return LaunchDarklyProvider(sdk_key, inicio=inicio)
+    if proveedor == "local":
+        return LocalFlagProvider(ruta=os.getenv("FLAGS_FILE"), inicio=inicio)
+    raise ValueError(f"Proveedor de flags desconocido: {proveedor!r}")
@@ -1,38 +1,92 @@
-from typing import List, Optional
-import os
+import time
 
-from fastapi import FastAPI, HTTPException, Header
+# Referencia para medir cuánto tarda el worker en estar listo
+_INICIO_IMPORT = time.perf_counter()
 
-from .models import Item, ItemBase
-from .database import db, get_next_id
+from itertools import islice
+from typing import Iterator, List, Literal, Optional, Tuple
+import json
+import math
+import os
 
-import ldclient
-from ldclient.config import Config
-from ldclient import Context  # 👈 USAMOS CONTEXT, NO DICT
+from fastapi import FastAPI, HTTPException, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+
+from .cache import CacheTTL
+from .flags import crear_proveedor_flags
+from .metricas import MetricasMiddleware, metricas
+from .models import (
+    ErrorImportacion,
+    Item,
+    ItemBase,
+    PrecioItem,
+    RespuestaPrecios,
+    ResultadoImportacion,
+    SolicitudPrecios,
+)
+from .database import db
+from .perfilador import PerfiladoEnCurso, perfilar
 
 
-# ---------------- LaunchDarkly ----------------
+# ---------------- Feature flags (LaunchDarkly o local) ----------------
 
 FEATURE_NEW_PRICING = "new-pricing-strategy"
 
 # Leemos la SDK key desde la variable de entorno
 LD_SDK_KEY = os.getenv("LAUNCHDARKLY_SDK_KEY")
 
-if not LD_SDK_KEY:
-    raise RuntimeError(
-        "[LaunchDarkly] ERROR: LAUNCHDARKLY_SDK_KEY no está definida en las "
-        "variables de entorno. Verifica el Secret de Kubernetes "
-        "(launchdarkly-secret) y el Deployment."
-    )
+# LaunchDarkly se inicializa en segundo plano: el import no espera a la red.
+# Con FLAGS_PROVIDER=local se usan flags locales.
+flag_client = crear_proveedor_flags(inicio=_INICIO_IMPORT)
+
+# Caché corta del valor del flag por usuario: los usuarios muy activos no
+# vuelven a evaluar el SDK en cada petición. Un cambio del flag tarda como
+# mucho FLAG_CACHE_TTL_S segundos en verse.
+_cache_flags = CacheTTL(
+    max_entradas=int(os.getenv("FLAG_CACHE_MAX", "10000")),
+    ttl_segundos=float(os.getenv("FLAG_CACHE_TTL_S", "5")),
+)
 
-# Configuramos el cliente de LaunchDarkly
-ldclient.set_config(Config(LD_SDK_KEY))
-ld_client = ldclient.get()
 
-if ld_client.is_initialized():
-    print("[LaunchDarkly] Cliente inicializado correctamente ✅")
-else:
-    print("[LaunchDarkly] Cliente NO inicializado ❌")
+def _evaluar_nuevo_precio(user_key: str) -> bool:
+    """Evalúa 'new-pricing-strategy' para un usuario en el proveedor de flags."""
+    metricas.incrementar("flag_evaluaciones_total")
+    try:
+        return bool(
+            flag_client.variation(
+                FEATURE_NEW_PRICING,
+                user_key,
+                False,     # valor por defecto si algo falla
+            )
+        )
+    except Exception as e:
+        print(f"[Flags] Error evaluando flag: {e}")
+        return False
+
+
+def nuevo_precio_activo(user_key: str) -> bool:
+    """Igual que `_evaluar_nuevo_precio`, pasando antes por la caché."""
+    encontrado, valor = _cache_flags.obtener(user_key)
+    if encontrado:
+        return valor
+    valor = _evaluar_nuevo_precio(user_key)
+    _cache_flags.guardar(user_key, valor)
+    return valor
+
+
+def aplicar_estrategia_precios(precios: List[float], activo: bool) -> List[float]:
+    """
+    Calcula los precios finales de una vez para todo el lote.
+
+    Nueva estrategia de precios: 10% descuento. Sin el flag, precio original.
+    """
+    if not activo:
+        return list(precios)
+    return [round(precio * 0.9, 2) for precio in precios]
 
 
 # ---------------- FastAPI ----------------
@@ -47,43 +101,277 @@ app = FastAPI(
 )
 
 
+# Histogramas de latencia por ruta (se pueden desactivar para comparar)
+if os.getenv("METRICAS_HABILITADAS", "1") != "0":
+    app.add_middleware(MetricasMiddleware, metricas=metricas)
+
+# El perfilador por muestreo solo se expone si se pide explícitamente
+PROFILING_HABILITADO = os.getenv("PROFILING_HABILITADO") == "1"
+
+
+def _sin_no_finitos(valor):
+    """Cambia NaN e infinitos por texto para poder devolverlos en JSON."""
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return str(valor)
+    if isinstance(valor, dict):
+        return {k: _sin_no_finitos(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_sin_no_finitos(v) for v in valor]
+    return valor
+
+
+@app.exception_handler(RequestValidationError)
+async def error_de_validacion(request: Request, exc: RequestValidationError):
+    """
+    Igual que el 422 por defecto, pero sin fallar cuando la entrada
+    rechazada trae NaN o Infinity (p. ej. un precio no finito).
+    """
+    detalle = _sin_no_finitos(jsonable_encoder(exc.errors()))
+    return JSONResponse(status_code=422, content={"detail": detalle})
+
+
+@app.on_event("startup")
+def startup_event():
+    """Dejamos en el log cómo arrancó el proveedor de flags."""
+    print(f"[Flags] Estado al arrancar: {flag_client.estado()}")
+
+
 @app.on_event("shutdown")
 def shutdown_event():
-    """Cerramos el cliente de LaunchDarkly cuando se apaga la app."""
-    ld_client.close()
+    """Cerramos el proveedor de flags y el store cuando se apaga la app."""
+    flag_client.close()
+    db.cerrar()
 
 
 # ---------------- Endpoints CRUD básicos ----------------
 
+# Límites de paginación para el modo JSON
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+
+# Cuántas líneas NDJSON juntamos antes de enviarlas al cliente
+LINEAS_POR_CHUNK = 500
+
+
+def _generar_ndjson(items: Iterator[Item]) -> Iterator[str]:
+    """Serializa los items uno a uno y los agrupa en chunks de texto NDJSON."""
+    lote: List[str] = []
+    for item in items:
+        lote.append(item.model_dump_json())
+        if len(lote) >= LINEAS_POR_CHUNK:
+            yield "\n".join(lote) + "\n"
+            lote = []
+    if lote:
+        yield "\n".join(lote) + "\n"
+
+
 @app.get("/items", response_model=List[Item])
-def listar_items():
-    """Lista todos los items almacenados en la 'base de datos' en memoria."""
-    return list(db.values())
+def listar_items(
+    response: Response,
+    cursor: Optional[int] = Query(
+        default=None,
+        ge=0,
+        description="Devuelve solo items con ID mayor que este valor",
+    ),
+    limit: Optional[int] = Query(
+        default=None,
+        ge=1,
+        description=(
+            f"Máximo de items a devolver. En JSON por defecto "
+            f"{LIMITE_POR_DEFECTO} (máx. {LIMITE_MAXIMO}); en NDJSON sin límite"
+        ),
+    ),
+    nombre_prefijo: Optional[str] = Query(
+        default=None, description="Filtra por prefijo del nombre"
+    ),
+    precio_min: Optional[float] = Query(
+        default=None, allow_inf_nan=False, description="Precio mínimo"
+    ),
+    precio_max: Optional[float] = Query(
+        default=None, allow_inf_nan=False, description="Precio máximo"
+    ),
+    formato: Literal["json", "ndjson"] = Query(
+        default="json",
+        description="'ndjson' transmite los items en streaming, uno por línea",
+    ),
+):
+    """
+    Lista los items en orden de ID, paginados por cursor.
+
+    En modo JSON, si puede haber más resultados se devuelve la cabecera
+    `X-Next-Cursor` con el valor a enviar como `cursor` en la siguiente
+    página. En modo NDJSON los items se serializan a medida que se envían.
+    """
+    if formato == "ndjson":
+        items = db.buscar(
+            desde_id=cursor or 0,
+            nombre_prefijo=nombre_prefijo,
+            precio_min=precio_min,
+            precio_max=precio_max,
+            limite=limit,
+        )
+        if limit is not None:
+            items = islice(items, limit)
+        return StreamingResponse(
+            _generar_ndjson(items), media_type="application/x-ndjson"
+        )
+
+    limit = min(limit or LIMITE_POR_DEFECTO, LIMITE_MAXIMO)
+    # Pedimos uno de más para saber si existe una página siguiente
+    items = db.buscar(
+        desde_id=cursor or 0,
+        nombre_prefijo=nombre_prefijo,
+        precio_min=precio_min,
+        precio_max=precio_max,
+        limite=limit + 1,
+    )
+    pagina = list(islice(items, limit + 1))
+    if len(pagina) > limit:
+        pagina = pagina[:limit]
+        response.headers["X-Next-Cursor"] = str(pagina[-1].id)
+    return pagina
 
 
 @app.post("/items", response_model=Item, status_code=201)
 def crear_item(item: ItemBase):
     """Crea un nuevo item con un ID autogenerado."""
-    item_id = get_next_id()
-    nuevo = Item(id=item_id, **item.dict())
-    db[item_id] = nuevo
+    nuevo = Item(id=db.next_id(), **item.dict())
+    db.put(nuevo)
     return nuevo
 
 
+# ---------------- Importación / exportación masiva (NDJSON) ----------------
+
+# Filas que validamos e insertamos juntas en la importación
+FILAS_POR_LOTE = 1000
+
+# Cuántos errores de importación detallamos en la respuesta
+MAX_ERRORES_REPORTADOS = 100
+
+# Longitud máxima de una línea NDJSON; las más largas se rechazan sin
+# acumularlas enteras en memoria
+MAX_BYTES_POR_LINEA = 1 << 20
+
+
+def _importar_lote(
+    lineas: List[bytes], primera_linea: int, errores: List[ErrorImportacion]
+) -> Tuple[int, int]:
+    """
+    Valida un lote de líneas NDJSON e inserta las válidas de una vez, con un
+    único rango de IDs reservado. Devuelve (aceptadas, rechazadas).
+    """
+    validos: List[Item] = []
+    rechazados = 0
+    for n, linea in enumerate(lineas, start=primera_linea):
+        if not linea.strip():
+            continue
+        try:
+            if len(linea) > MAX_BYTES_POR_LINEA:
+                raise ValueError(f"línea de más de {MAX_BYTES_POR_LINEA} bytes")
+            datos = json.loads(linea)
+            if not isinstance(datos, dict):
+                raise ValueError("se esperaba un objeto JSON")
+            # El ID lo asigna el servidor; validamos con uno provisional
+            datos["id"] = 0
+            validos.append(Item.model_validate(datos))
+        except ValidationError as e:
+            rechazados += 1
+            if len(errores) < MAX_ERRORES_REPORTADOS:
+                detalle = "; ".join(
+                    f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                    for error in e.errors()
+                )
+                errores.append(ErrorImportacion(linea=n, error=detalle))
+        except (ValueError, RecursionError) as e:
+            # RecursionError: JSON anidado en exceso (p. ej. "[[[[...")
+            rechazados += 1
+            if len(errores) < MAX_ERRORES_REPORTADOS:
+                errores.append(ErrorImportacion(linea=n, error=str(e)))
+
+    if validos:
+        for item_id, item in zip(db.ids.reservar(len(validos)), validos):
+            item.id = item_id
+        db.put_many(validos)
+    return len(validos), rechazados
+
+
+@app.post("/items/bulk", response_model=ResultadoImportacion)
+async def importar_items(request: Request):
+    """
+    Importa items en bloque desde un cuerpo NDJSON (un objeto por línea).
+
+    El cuerpo se lee en streaming y se procesa por lotes de
+    `FILAS_POR_LOTE` líneas. Las líneas inválidas se rechazan sin detener la
+    importación; se informa del total y del detalle de las primeras. Una
+    línea de más de `MAX_BYTES_POR_LINEA` bytes se rechaza y se descarta
+    según llega.
+    """
+    errores: List[ErrorImportacion] = []
+    aceptados = rechazados = 0
+    pendiente = b""
+    descartando = False
+    lote: List[bytes] = []
+    primera_linea = 1
+
+    async def procesar() -> None:
+        nonlocal aceptados, rechazados, lote, primera_linea
+        ok, mal = await run_in_threadpool(_importar_lote, lote, primera_linea, errores)
+        aceptados += ok
+        rechazados += mal
+        primera_linea += len(lote)
+        lote = []
+
+    async for chunk in request.stream():
+        if descartando:
+            # Saltamos el resto de la línea demasiado larga
+            fin = chunk.find(b"\n")
+            if fin < 0:
+                continue
+            chunk = chunk[fin + 1:]
+            descartando = False
+        lineas = (pendiente + chunk).split(b"\n")
+        pendiente = lineas.pop()
+        lote.extend(lineas)
+        if len(pendiente) > MAX_BYTES_POR_LINEA:
+            # Basta con un prefijo para que el lote la rechace por longitud
+            lote.append(pendiente[:MAX_BYTES_POR_LINEA + 1])
+            pendiente = b""
+            descartando = True
+        if len(lote) >= FILAS_POR_LOTE:
+            await procesar()
+    if pendiente:
+        lote.append(pendiente)
+    if lote:
+        await procesar()
+
+    return ResultadoImportacion(
+        aceptados=aceptados, rechazados=rechazados, errores=errores
+    )
+
+
+@app.get("/items/export")
+def exportar_items():
+    """Exporta todos los items en NDJSON, en orden de ID y en streaming."""
+    return StreamingResponse(
+        _generar_ndjson(db.buscar()), media_type="application/x-ndjson"
+    )
+
+
+# Va después de /items/export para que "export" no se tome como un ID
 @app.get("/items/{item_id}", response_model=Item)
 def obtener_item(item_id: int):
     """Obtiene un item por ID."""
-    if item_id not in db:
+    item = db.get(item_id)
+    if item is None:
         raise HTTPException(status_code=404, detail="Item no encontrado")
-    return db[item_id]
+    return item
 
 
 @app.delete("/items/{item_id}", status_code=204)
 def eliminar_item(item_id: int):
     """Elimina un item por ID."""
-    if item_id not in db:
+    if not db.delete(item_id):
         raise HTTPException(status_code=404, detail="Item no encontrado")
-    del db[item_id]
     return
 
 
@@ -104,34 +392,48 @@ def obtener_precio_item(
     Si el feature flag 'new-pricing-strategy' está activo para el usuario,
     aplica un 10% de descuento como ejemplo de nueva estrategia de precios.
     """
-    if item_id not in db:
+    item = db.get(item_id)
+    if item is None:
         raise HTTPException(status_code=404, detail="Item no encontrado")
 
-    item = db[item_id]
-
-    # 👇 CONTEXTO UNIFICADO (SDK 8+)
-    # Creamos un contexto de tipo "user" con la key del header
-    context = Context.create(x_user_id or "anonimo")
+    activo = nuevo_precio_activo(x_user_id or "anonimo")
+    return aplicar_estrategia_precios([item.precio], activo)[0]
 
-    try:
-        # En el SDK Python la API correcta es 'variation'
-        nuevo_precio_activo = bool(
-            ld_client.variation(
-                FEATURE_NEW_PRICING,
-                context,   # 👈 YA NO ES dict, ES Context
-                False,     # valor por defecto si algo falla
-            )
-        )
-    except Exception as e:
-        print(f"[LaunchDarkly] Error evaluando flag: {e}")
-        nuevo_precio_activo = False
 
-    if nuevo_precio_activo:
-        # Nueva estrategia de precios: 10% descuento
-        return round(item.precio * 0.9, 2)
-    else:
-        # Precio original
-        return item.precio
+@app.post("/items/precios", response_model=RespuestaPrecios)
+def obtener_precios_items(
+    solicitud: SolicitudPrecios,
+    x_user_id: Optional[str] = Header(
+        default="anonimo",
+        alias="X-User-Id",
+        description="Identificador del usuario para evaluar el feature flag",
+    ),
+):
+    """
+    Devuelve los precios de varios items en una sola llamada (p. ej. un
+    carrito). El flag se evalúa una única vez para el usuario y el descuento
+    se aplica al lote completo. Los IDs inexistentes se listan aparte.
+    """
+    encontrados = []
+    no_encontrados = []
+    for item_id in solicitud.ids:
+        item = db.get(item_id)
+        if item is None:
+            no_encontrados.append(item_id)
+        else:
+            encontrados.append(item)
+
+    activo = nuevo_precio_activo(x_user_id or "anonimo")
+    precios = aplicar_estrategia_precios([item.precio for item in encontrados], activo)
+
+    return RespuestaPrecios(
+        nuevo_precio_activo=activo,
+        precios=[
+            PrecioItem(id=item.id, precio=precio)
+            for item, precio in zip(encontrados, precios)
+        ],
+        no_encontrados=no_encontrados,
+    )
 
 
 # ---------------- Endpoint de debug LaunchDarkly ----------------
@@ -143,24 +445,81 @@ def debug_launchdarkly(
     """
     Endpoint para verificar desde fuera si:
     - La SDK key está configurada
-    - El cliente de LaunchDarkly está inicializado
+    - El proveedor de flags (LaunchDarkly o local) está inicializado y
+      cuánto tardó desde el arranque del worker
     - El valor actual del flag 'new-pricing-strategy' para un usuario dado
     """
-    context = Context.create(x_user_id or "debug-user")
-
     status = {
         "sdk_key_configurada": bool(LD_SDK_KEY),
-        "cliente_inicializado": ld_client.is_initialized(),
+        "cliente_inicializado": flag_client.is_initialized(),
+        "proveedor": flag_client.estado(),
         "flag_name": FEATURE_NEW_PRICING,
+        "cache_flags": {
+            "entradas": len(_cache_flags),
+            "aciertos": _cache_flags.aciertos,
+            "fallos": _cache_flags.fallos,
+        },
     }
 
     try:
-        status["flag_value"] = ld_client.variation(
+        status["flag_value"] = flag_client.variation(
             FEATURE_NEW_PRICING,
-            context,
+            x_user_id or "debug-user",
             False,
         )
     except Exception as e:
         status["error"] = str(e)
 
     return status
+
+
+# ---------------- Observabilidad ----------------
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def exportar_metricas():
+    """Métricas del worker en formato Prometheus."""
+    texto = metricas.exportar(
+        extra=[
+            (
+                "flag_cache_aciertos_total",
+                "counter",
+                "Evaluaciones del flag servidas desde la caché",
+                _cache_flags.aciertos,
+            ),
+            (
+                "flag_cache_fallos_total",
+                "counter",
+                "Evaluaciones del flag que no estaban en la caché",
+                _cache_flags.fallos,
+            ),
+            (
+                "flag_cache_entradas",
+                "gauge",
+                "Usuarios en la caché del flag",
+                len(_cache_flags),
+            ),
+            ("items_almacenados", "gauge", "Items en el store", len(db)),
+        ]
+    )
+    return PlainTextResponse(texto, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/profile")
+def debug_profile(
+    segundos: float = Query(default=5.0, gt=0, le=60),
+    intervalo_ms: float = Query(default=5.0, ge=1, le=1000),
+    top: int = Query(default=20, ge=1, le=100),
+):
+    """
+    Perfila el worker por muestreo durante `segundos` y devuelve las pilas y
+    funciones más frecuentes. Requiere PROFILING_HABILITADO=1.
+    """
+    if not PROFILING_HABILITADO:
+        raise HTTPException(
+            status_code=404,
+            detail="Perfilado deshabilitado (define PROFILING_HABILITADO=1)",
+        )
+    try:
+        return perfilar(segundos, intervalo=intervalo_ms / 1000, top=top)
+    except PerfiladoEnCurso as e:
+        raise HTTPException(status_code=409, detail=str(e))
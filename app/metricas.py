@@ -0,0 +1,173 @@
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Límites (en segundos) de los buckets del histograma de latencia
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Métodos HTTP que se usan como etiqueta; el resto se agrupa en "OTHER"
+METODOS = frozenset({"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"})
+
+# Descripción de los contadores que incrementa la app
+CONTADORES = {
+    "flag_evaluaciones_total": "Evaluaciones del feature flag en el proveedor",
+}
+
+
+class _Shard:
+    """Métricas de un solo hilo: solo ese hilo escribe aquí, así que sin locks."""
+
+    __slots__ = ("latencias", "contadores")
+
+    def __init__(self) -> None:
+        # (método, ruta, status) -> [cuenta por bucket..., cuenta +Inf, suma]
+        self.latencias: Dict[Tuple[str, str, int], List[float]] = {}
+        self.contadores: Dict[str, int] = {}
+
+
+class Metricas:
+    """
+    Histogramas de latencia por ruta y contadores, exportables en formato
+    Prometheus.
+
+    Cada hilo acumula en su propio shard sin locks; al exportar se suman
+    todos. Cuando un hilo termina, su shard se vuelca en uno base, así el
+    número de shards no crece con cada hilo que haya existido. Una lectura
+    concurrente puede ver una observación a medias, algo aceptable para
+    métricas.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS) -> None:
+        self.buckets = buckets
+        self._local = threading.local()
+        # Totales de los hilos que ya terminaron
+        self._base = _Shard()
+        self._shards: List[_Shard] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard()
+            # El lock solo se toma una vez por hilo, al registrar su shard
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            weakref.finalize(threading.current_thread(), self._retirar, shard)
+        return shard
+
+    def _retirar(self, shard: _Shard) -> None:
+        """Vuelca en la base el shard de un hilo que ya no existe."""
+        with self._lock:
+            self._sumar(self._base, shard)
+            self._shards.remove(shard)
+
+    @staticmethod
+    def _sumar(destino: _Shard, origen: _Shard) -> None:
+        for clave, fila in list(origen.latencias.items()):
+            total = destino.latencias.setdefault(clave, [0] * len(fila))
+            for i, valor in enumerate(fila):
+                total[i] += valor
+        for nombre, valor in list(origen.contadores.items()):
+            destino.contadores[nombre] = destino.contadores.get(nombre, 0) + valor
+
+    def observar(self, metodo: str, ruta: str, status: int, segundos: float) -> None:
+        latencias = self._shard().latencias
+        fila = latencias.get((metodo, ruta, status))
+        if fila is None:
+            fila = latencias[(metodo, ruta, status)] = [0] * (len(self.buckets) + 2)
+        fila[bisect_left(self.buckets, segundos)] += 1
+        fila[-1] += segundos
+
+    def incrementar(self, nombre: str, cantidad: int = 1) -> None:
+        contadores = self._shard().contadores
+        contadores[nombre] = contadores.get(nombre, 0) + cantidad
+
+    def exportar(self, extra: Iterable[Tuple[str, str, str, float]] = ()) -> str:
+        """
+        Texto en formato de exposición de Prometheus.
+
+        `extra` añade métricas calculadas al vuelo, como tuplas
+        (nombre, tipo, descripción, valor).
+        """
+        suma = _Shard()
+        suma.contadores = dict.fromkeys(CONTADORES, 0)
+        # Con el lock, un shard no puede pasar a la base mientras sumamos
+        with self._lock:
+            for shard in [self._base, *self._shards]:
+                self._sumar(suma, shard)
+        latencias, contadores = suma.latencias, suma.contadores
+
+        metrica = "http_request_duration_seconds"
+        lineas = [
+            f"# HELP {metrica} Latencia de las peticiones HTTP",
+            f"# TYPE {metrica} histogram",
+        ]
+        for (metodo, ruta, status), fila in sorted(latencias.items()):
+            etiquetas = f'method="{metodo}",route="{ruta}",status="{status}"'
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets + ("+Inf",), fila[:-1]):
+                acumulado += cuenta
+                lineas.append(
+                    f'{metrica}_bucket{{{etiquetas},le="{limite}"}} {acumulado}'
+                )
+            lineas.append(f"{metrica}_sum{{{etiquetas}}} {fila[-1]}")
+            lineas.append(f"{metrica}_count{{{etiquetas}}} {acumulado}")
+
+        for nombre, valor in sorted(contadores.items()):
+            lineas.append(f"# HELP {nombre} {CONTADORES.get(nombre, nombre)}")
+            lineas.append(f"# TYPE {nombre} counter")
+            lineas.append(f"{nombre} {valor}")
+
+        for nombre, tipo, ayuda, valor in extra:
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            lineas.append(f"{nombre} {valor}")
+
+        return "\n".join(lineas) + "\n"
+
+
+class MetricasMiddleware:
+    """
+    Middleware ASGI que mide la latencia de cada petición HTTP por ruta.
+
+    Usa la plantilla de la ruta (`/items/{item_id}`) y no la URL real, para
+    no disparar la cardinalidad. Las peticiones sin ruta (404) y los métodos
+    no estándar se agrupan.
+    """
+
+    def __init__(self, app, metricas: Metricas) -> None:
+        self.app = app
+        self.metricas = metricas
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        status: Optional[int] = None
+
+        async def send_con_status(mensaje) -> None:
+            nonlocal status
+            if mensaje["type"] == "http.response.start":
+                status = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, send_con_status)
+        finally:
+            ruta = scope.get("route")
+            metodo = scope["method"]
+            self.metricas.observar(
+                metodo if metodo in METODOS else "OTHER",
+                getattr(ruta, "path", "sin_ruta"),
+                status or 500,
+                time.perf_counter() - inicio,
+            )
+
+
+# Métricas del proceso (cada worker de uvicorn tiene las suyas)
+metricas = Metricas()
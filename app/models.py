@@ -1,12 +1,42 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 
 class ItemBase(BaseModel):
     nombre: str
     descripcion: Optional[str] = None
-    precio: float
+    precio: float = Field(..., allow_inf_nan=False)
 
 
 class Item(ItemBase):
     id: int
+
+
+# Máximo de items por petición de precios en lote
+MAX_IDS_POR_LOTE = 1000
+
+
+class SolicitudPrecios(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_IDS_POR_LOTE)
+
+
+class PrecioItem(BaseModel):
+    id: int
+    precio: float
+
+
+class RespuestaPrecios(BaseModel):
+    nuevo_precio_activo: bool
+    precios: List[PrecioItem]
+    no_encontrados: List[int]
+
+
+class ErrorImportacion(BaseModel):
+    linea: int
+    error: str
+
+
+class ResultadoImportacion(BaseModel):
+    aceptados: int
+    rechazados: int
+    errores: List[ErrorImportacion]
@@ -0,0 +1,89 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+# Profundidad máxima de pila que guardamos por muestra
+_PROFUNDIDAD_MAX = 40
+
+# Hilos cuya pila termina en estos módulos están esperando, no trabajando
+_MODULOS_INACTIVOS = ("threading.py", "selectors.py", "queue.py")
+
+# Solo una sesión de perfilado a la vez por proceso
+_en_curso = threading.Lock()
+
+
+def _pila(frame) -> Tuple[str, ...]:
+    marcos = []
+    while frame is not None and len(marcos) < _PROFUNDIDAD_MAX:
+        codigo = frame.f_code
+        marcos.append(
+            f"{os.path.basename(codigo.co_filename)}:{frame.f_lineno} {codigo.co_name}"
+        )
+        frame = frame.f_back
+    # De la más externa a la más interna
+    return tuple(reversed(marcos))
+
+
+def _inactiva(frame) -> bool:
+    return os.path.basename(frame.f_code.co_filename) in _MODULOS_INACTIVOS
+
+
+class PerfiladoEnCurso(RuntimeError):
+    """Ya hay otra sesión de perfilado en este proceso."""
+
+
+def perfilar(
+    segundos: float,
+    intervalo: float = 0.005,
+    top: int = 20,
+    incluir_inactivos: bool = False,
+) -> Dict[str, Any]:
+    """
+    Perfilador por muestreo: cada `intervalo` segundos toma la pila de
+    todos los hilos (menos el propio) durante `segundos` y agrega las pilas
+    y funciones más frecuentes.
+
+    No instrumenta nada: fuera de una sesión no tiene coste.
+    """
+    if not _en_curso.acquire(blocking=False):
+        raise PerfiladoEnCurso("Ya hay un perfilado en curso")
+    try:
+        propio = threading.get_ident()
+        pilas: Counter = Counter()
+        funciones: Counter = Counter()
+        muestras = 0
+        fin = time.perf_counter() + segundos
+        while time.perf_counter() < fin:
+            for ident, frame in sys._current_frames().items():
+                if ident == propio:
+                    continue
+                if not incluir_inactivos and _inactiva(frame):
+                    continue
+                pila = _pila(frame)
+                pilas[pila] += 1
+                # Tiempo propio: la función en la cima de la pila
+                funciones[pila[-1]] += 1
+                muestras += 1
+            time.sleep(intervalo)
+    finally:
+        _en_curso.release()
+
+    def porcentaje(cuenta: int) -> Optional[float]:
+        return round(100 * cuenta / muestras, 2) if muestras else None
+
+    return {
+        "segundos": segundos,
+        "intervalo_s": intervalo,
+        "muestras": muestras,
+        "funciones": [
+            {"funcion": funcion, "muestras": n, "porcentaje": porcentaje(n)}
+            for funcion, n in funciones.most_common(top)
+        ],
+        "pilas": [
+            {"pila": list(pila), "muestras": n, "porcentaje": porcentaje(n)}
+            for pila, n in pilas.most_common(top)
+        ],
+    }
@@ -0,0 +1,453 @@
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .database import IdAllocator, ItemRepository
+from .models import Item
+
+OP_PUT = 1
+OP_DELETE = 2
+
+# Registro: crc32 + (op, id, precio, len(nombre), len(descripcion)) + textos.
+# Una longitud de descripción -1 representa None.
+_CRC = struct.Struct("<I")
+_CUERPO = struct.Struct("<Bqdii")
+_TAM_CABECERA = _CRC.size + _CUERPO.size
+
+_MAGIA_SNAPSHOT = b"ITSNAP1\n"
+# Generación del snapshot y último ID repartido cuando se tomó
+_CABECERA_SNAPSHOT = struct.Struct("<qq")
+
+_PATRON_ARCHIVO = re.compile(r"^(wal|snapshot)-(\d+)\.(log|bin)$")
+
+# Striping de los locks que ordenan "escribir en el log + aplicar"
+_LOCKS_ESCRITURA = 64
+
+MODOS_SYNC = ("siempre", "grupo")
+
+
+def _registro(
+    op: int,
+    item_id: int,
+    precio: float,
+    nombre: bytes,
+    descripcion: Optional[bytes],
+) -> bytes:
+    len_desc = -1 if descripcion is None else len(descripcion)
+    cuerpo = _CUERPO.pack(op, item_id, precio, len(nombre), len_desc)
+    cuerpo += nombre + (descripcion or b"")
+    return _CRC.pack(zlib.crc32(cuerpo)) + cuerpo
+
+
+def codificar_put(item: Item) -> bytes:
+    descripcion = None if item.descripcion is None else item.descripcion.encode()
+    return _registro(OP_PUT, item.id, item.precio, item.nombre.encode(), descripcion)
+
+
+def codificar_delete(item_id: int) -> bytes:
+    return _registro(OP_DELETE, item_id, 0.0, b"", None)
+
+
+def leer_registros(
+    buf, inicio: int = 0
+) -> Iterator[Tuple[int, int, Optional[Item], int]]:
+    """
+    Decodifica registros de `buf` (bytes o mmap) a partir de `inicio`.
+
+    Devuelve tuplas (op, id, item, offset_fin). Se detiene en el primer
+    registro incompleto o con CRC inválido, p. ej. una escritura a medias
+    tras una caída.
+    """
+    fin_buf = len(buf)
+    pos = inicio
+    while pos + _TAM_CABECERA <= fin_buf:
+        (crc,) = _CRC.unpack_from(buf, pos)
+        op, item_id, precio, len_nombre, len_desc = _CUERPO.unpack_from(
+            buf, pos + _CRC.size
+        )
+        fin = pos + _TAM_CABECERA + len_nombre + max(len_desc, 0)
+        if len_nombre < 0 or fin > fin_buf:
+            return
+        if zlib.crc32(buf[pos + _CRC.size:fin]) != crc:
+            return
+        item = None
+        if op == OP_PUT:
+            textos = pos + _TAM_CABECERA
+            nombre = buf[textos:textos + len_nombre].decode()
+            descripcion = (
+                None if len_desc < 0 else buf[textos + len_nombre:fin].decode()
+            )
+            item = Item(
+                id=item_id, nombre=nombre, descripcion=descripcion, precio=precio
+            )
+        elif op != OP_DELETE:
+            return
+        yield op, item_id, item, fin
+        pos = fin
+
+
+def _fsync_directorio(directorio: str) -> None:
+    fd = os.open(directorio, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    """
+    Log de escritura anticipada con dos políticas de durabilidad:
+
+    - "siempre": fsync en cada escritura. Máxima durabilidad, menor throughput.
+    - "grupo": group commit líder/seguidor. Quien espera su escritura y no
+      ve ningún fsync en curso lo hace él mismo y cubre todo lo escrito
+      hasta entonces; las escrituras que llegan durante ese fsync se
+      sincronizan juntas en el siguiente. Sigue siendo durable y amortiza
+      el coste sin añadir espera cuando hay un solo escritor.
+
+    `ventana_ms` es el máximo que un líder espera para juntar más
+    escrituras, y solo si hay otros escritores esperando (0 = nunca).
+    """
+
+    def __init__(self, ruta: str, modo: str = "grupo", ventana_ms: float = 0.0) -> None:
+        if modo not in MODOS_SYNC:
+            raise ValueError(f"Modo de sync desconocido: {modo!r}")
+        self.modo = modo
+        self._ventana = ventana_ms / 1000
+        self._f = self._abrir(ruta)
+        self._lock = threading.Lock()
+        self._sincronizado_cond = threading.Condition(self._lock)
+        # Serializa los fsync del líder con las rotaciones
+        self._lock_sync = threading.Lock()
+        self._escrito = 0
+        self._sincronizado = 0
+        # Estado del group commit, protegido por `_lock`
+        self._sincronizando = False
+        self._esperando = 0
+
+    @staticmethod
+    def _abrir(ruta: str):
+        f = open(ruta, "ab")
+        # Sin fsync del directorio, el log recién creado podría no existir
+        # tras una caída aunque sus escrituras ya estén sincronizadas
+        _fsync_directorio(os.path.dirname(ruta) or ".")
+        return f
+
+    def append(self, datos: bytes) -> int:
+        """Escribe en el log y devuelve el número de secuencia a esperar."""
+        with self._lock:
+            self._f.write(datos)
+            self._escrito += 1
+            if self.modo == "siempre":
+                self._f.flush()
+                os.fsync(self._f.fileno())
+                self._sincronizado = self._escrito
+            return self._escrito
+
+    def esperar(self, secuencia: int) -> None:
+        """Bloquea hasta que la escritura `secuencia` está en disco."""
+        while True:
+            with self._sincronizado_cond:
+                self._esperando += 1
+                while self._sincronizado < secuencia and self._sincronizando:
+                    self._sincronizado_cond.wait()
+                self._esperando -= 1
+                if self._sincronizado >= secuencia:
+                    return
+                # No hay fsync en curso: este hilo hace de líder
+                self._sincronizando = True
+                acompanado = self._esperando > 0
+            try:
+                if acompanado and self._ventana:
+                    time.sleep(self._ventana)
+                self._sincronizar()
+            finally:
+                with self._sincronizado_cond:
+                    self._sincronizando = False
+                    self._sincronizado_cond.notify_all()
+
+    def _sincronizar(self) -> None:
+        with self._lock_sync:
+            with self._lock:
+                if self._sincronizado == self._escrito:
+                    return
+                self._f.flush()
+                objetivo = self._escrito
+                f = self._f
+            # El fsync va fuera del lock para no frenar a quien sigue escribiendo
+            os.fsync(f.fileno())
+            with self._sincronizado_cond:
+                self._sincronizado = max(self._sincronizado, objetivo)
+                self._sincronizado_cond.notify_all()
+
+    def rotar(self, ruta: str) -> None:
+        """Cierra el log actual (ya sincronizado) y sigue escribiendo en `ruta`."""
+        with self._lock_sync, self._sincronizado_cond:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._f.close()
+            self._f = self._abrir(ruta)
+            self._sincronizado = self._escrito
+            self._sincronizado_cond.notify_all()
+
+    def cerrar(self) -> None:
+        with self._lock_sync, self._sincronizado_cond:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._f.close()
+            self._sincronizado = self._escrito
+            self._sincronizado_cond.notify_all()
+
+
+class PersistentStore:
+    """
+    Envoltorio que hace persistente cualquier `ItemRepository`.
+
+    Cada alta o baja se escribe en un WAL (`wal-<gen>.log`) antes de
+    aplicarse en memoria. Cada `snapshot_cada` operaciones se toma en
+    segundo plano un snapshot compactado (`snapshot-<gen>.bin`) y se
+    descartan los logs anteriores. Al arrancar se mapea en memoria el último
+    snapshot y solo se reproduce la cola del log.
+    """
+
+    def __init__(
+        self,
+        interno: ItemRepository,
+        directorio: str,
+        modo_sync: str = "grupo",
+        ventana_ms: float = 0.0,
+        snapshot_cada: int = 100_000,
+    ) -> None:
+        self._interno = interno
+        self.ids: IdAllocator = interno.ids
+        self._directorio = directorio
+        self._snapshot_cada = snapshot_cada
+        self._locks = [threading.Lock() for _ in range(_LOCKS_ESCRITURA)]
+        self._lock_snapshot = threading.Lock()
+        # Protege el contador de operaciones y el arranque de la compactación
+        self._lock_contador = threading.Lock()
+        self._hilo_snapshot: Optional[threading.Thread] = None
+        self._desde_snapshot = 0
+
+        os.makedirs(directorio, exist_ok=True)
+        inicio = time.perf_counter()
+        self._gen, registros_snapshot, registros_log = self._recuperar()
+        self.recuperacion = {
+            "segundos": round(time.perf_counter() - inicio, 3),
+            "registros_snapshot": registros_snapshot,
+            "registros_log": registros_log,
+            "items": len(interno),
+        }
+        print(f"[Persistencia] Datos recuperados de {directorio}: {self.recuperacion}")
+        self._wal = WriteAheadLog(self._ruta("wal", self._gen), modo_sync, ventana_ms)
+
+    # ---------------- Archivos ----------------
+
+    def _ruta(self, tipo: str, gen: int) -> str:
+        extension = "log" if tipo == "wal" else "bin"
+        return os.path.join(self._directorio, f"{tipo}-{gen:08d}.{extension}")
+
+    def _archivos(self) -> Dict[str, List[int]]:
+        encontrados: Dict[str, List[int]] = {"wal": [], "snapshot": []}
+        for nombre in os.listdir(self._directorio):
+            coincidencia = _PATRON_ARCHIVO.match(nombre)
+            if coincidencia:
+                encontrados[coincidencia.group(1)].append(int(coincidencia.group(2)))
+        for gens in encontrados.values():
+            gens.sort()
+        return encontrados
+
+    # ---------------- Recuperación ----------------
+
+    def _recuperar(self) -> Tuple[int, int, int]:
+        archivos = self._archivos()
+        gen_snapshot = 0
+        registros_snapshot = 0
+        ultimo_id = 0
+        if archivos["snapshot"]:
+            gen_snapshot = archivos["snapshot"][-1]
+            registros_snapshot, ultimo_id = self._cargar_snapshot(
+                self._ruta("snapshot", gen_snapshot)
+            )
+
+        # El snapshot G ya incluye todo lo escrito en logs anteriores a G
+        registros_log = 0
+        gens_log = [gen for gen in archivos["wal"] if gen >= gen_snapshot]
+        for gen in gens_log:
+            registros, ultimo = self._reproducir_log(self._ruta("wal", gen))
+            registros_log += registros
+            ultimo_id = max(ultimo_id, ultimo)
+
+        self.ids.observar(ultimo_id)
+        return max([gen_snapshot] + gens_log), registros_snapshot, registros_log
+
+    def _cargar_snapshot(self, ruta: str) -> Tuple[int, int]:
+        with open(ruta, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                if buf[:len(_MAGIA_SNAPSHOT)] != _MAGIA_SNAPSHOT:
+                    raise RuntimeError(f"[Persistencia] Snapshot inválido: {ruta}")
+                _, ultimo_id = _CABECERA_SNAPSHOT.unpack_from(buf, len(_MAGIA_SNAPSHOT))
+                inicio = len(_MAGIA_SNAPSHOT) + _CABECERA_SNAPSHOT.size
+                # Un único put_many: los índices se ordenan una sola vez
+                items = [item for _, _, item, _ in leer_registros(buf, inicio)]
+                self._interno.put_many(items)
+        return len(items), ultimo_id
+
+    def _reproducir_log(self, ruta: str) -> Tuple[int, int]:
+        tamano = os.path.getsize(ruta)
+        if tamano == 0:
+            return 0, 0
+        total = 0
+        ultimo_id = 0
+        valido = 0
+        with open(ruta, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                # Agrupamos altas consecutivas; una baja vacía el lote antes
+                # de aplicarse para respetar el orden del log
+                lote: List[Item] = []
+                for op, item_id, item, valido in leer_registros(buf):
+                    total += 1
+                    ultimo_id = max(ultimo_id, item_id)
+                    if op == OP_PUT:
+                        lote.append(item)
+                    else:
+                        self._interno.put_many(lote)
+                        lote = []
+                        self._interno.delete(item_id)
+                self._interno.put_many(lote)
+        if valido < tamano:
+            print(
+                f"[Persistencia] Cola incompleta en {ruta}; "
+                f"se trunca en {valido} bytes"
+            )
+            with open(ruta, "r+b") as f:
+                f.truncate(valido)
+                os.fsync(f.fileno())
+        return total, ultimo_id
+
+    # ---------------- Snapshots ----------------
+
+    def compactar(self) -> None:
+        """Toma un snapshot del estado actual y descarta los logs antiguos."""
+        with self._lock_snapshot:
+            # Con todos los locks tomados ninguna operación queda a medias
+            # entre el log viejo y el nuevo
+            for lock in self._locks:
+                lock.acquire()
+            try:
+                gen = self._gen + 1
+                ultimo_id = self.ids.ultimo
+                self._wal.rotar(self._ruta("wal", gen))
+                self._gen = gen
+                with self._lock_contador:
+                    self._desde_snapshot = 0
+            finally:
+                for lock in self._locks:
+                    lock.release()
+
+            # Lo que entre durante el volcado queda también en el log nuevo;
+            # reproducirlo sobre el snapshot es idempotente
+            ruta = self._ruta("snapshot", gen)
+            temporal = ruta + ".tmp"
+            with open(temporal, "wb", buffering=1 << 20) as f:
+                f.write(_MAGIA_SNAPSHOT)
+                f.write(_CABECERA_SNAPSHOT.pack(gen, ultimo_id))
+                for item in self._interno.buscar():
+                    f.write(codificar_put(item))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, ruta)
+            _fsync_directorio(self._directorio)
+
+            archivos = self._archivos()
+            for tipo, gens in archivos.items():
+                for viejo in gens:
+                    if viejo < gen:
+                        os.remove(self._ruta(tipo, viejo))
+
+    def _contar(self, operaciones: int) -> None:
+        with self._lock_contador:
+            self._desde_snapshot += operaciones
+            if self._desde_snapshot < self._snapshot_cada:
+                return
+            if self._hilo_snapshot is not None and self._hilo_snapshot.is_alive():
+                return
+            self._hilo_snapshot = threading.Thread(
+                target=self.compactar, name="snapshot", daemon=True
+            )
+            self._hilo_snapshot.start()
+
+    # ---------------- Interfaz del repositorio ----------------
+
+    def _lock_de(self, item_id: int) -> threading.Lock:
+        return self._locks[item_id % _LOCKS_ESCRITURA]
+
+    def __len__(self) -> int:
+        return len(self._interno)
+
+    def next_id(self) -> int:
+        return self._interno.next_id()
+
+    def get(self, item_id: int) -> Optional[Item]:
+        return self._interno.get(item_id)
+
+    def buscar(
+        self,
+        desde_id: int = 0,
+        nombre_prefijo: Optional[str] = None,
+        precio_min: Optional[float] = None,
+        precio_max: Optional[float] = None,
+        limite: Optional[int] = None,
+    ) -> Iterator[Item]:
+        return self._interno.buscar(
+            desde_id, nombre_prefijo, precio_min, precio_max, limite
+        )
+
+    def put(self, item: Item) -> None:
+        with self._lock_de(item.id):
+            secuencia = self._wal.append(codificar_put(item))
+            self._interno.put(item)
+        self._wal.esperar(secuencia)
+        self._contar(1)
+
+    def put_many(self, items: List[Item]) -> None:
+        if not items:
+            return
+        # Tomamos los locks implicados en orden fijo para no bloquearnos
+        implicados = sorted({item.id % _LOCKS_ESCRITURA for item in items})
+        locks = [self._locks[n] for n in implicados]
+        for lock in locks:
+            lock.acquire()
+        try:
+            secuencia = self._wal.append(b"".join(codificar_put(i) for i in items))
+            self._interno.put_many(items)
+        finally:
+            for lock in locks:
+                lock.release()
+        self._wal.esperar(secuencia)
+        self._contar(len(items))
+
+    def delete(self, item_id: int) -> bool:
+        with self._lock_de(item_id):
+            if self._interno.get(item_id) is None:
+                return False
+            secuencia = self._wal.append(codificar_delete(item_id))
+            self._interno.delete(item_id)
+        self._wal.esperar(secuencia)
+        self._contar(1)
+        return True
+
+    def cerrar(self) -> None:
+        # Una compactación pendiente no debe rotar un log ya cerrado
+        with self._lock_contador:
+            hilo = self._hilo_snapshot
+        if hilo is not None:
+            hilo.join()
+        with self._lock_snapshot:
+            self._wal.cerrar()
+        self._interno.cerrar()
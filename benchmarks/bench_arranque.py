@@ -0,0 +1,77 @@
+"""
+Benchmark de arranque: tiempo desde el import de `app.main` hasta que el
+proveedor de flags está listo, y latencia de la primera petición que evalúa
+el flag, con flags locales y con LaunchDarkly.
+
+Cada modo se mide en un proceso nuevo. Para LaunchDarkly hace falta
+`LAUNCHDARKLY_SDK_KEY`; sin ella se usa una key falsa y se mide cuánto tarda
+el worker en responder aunque el SDK no llegue a conectar.
+
+Uso:
+    python -m benchmarks.bench_arranque --espera 10
+"""
+import argparse
+import os
+import time
+
+from benchmarks.comun import devolver, imprimir, por_modo
+
+MODOS = ("local", "launchdarkly")
+
+
+def _medir(modo: str, espera: float) -> dict:
+    os.environ["FLAGS_PROVIDER"] = modo
+    if modo == "launchdarkly":
+        os.environ.setdefault("LAUNCHDARKLY_SDK_KEY", "sdk-benchmark")
+
+    inicio = time.perf_counter()
+    from fastapi.testclient import TestClient
+
+    from app.main import app, flag_client
+
+    import_s = time.perf_counter() - inicio
+
+    with TestClient(app) as client:
+        # Con el store vacío la petición daría 404 antes de evaluar el flag
+        item = client.post("/items", json={"nombre": "bench", "precio": 10.0})
+        assert item.status_code == 201, item.text
+        inicio = time.perf_counter()
+        respuesta = client.get(
+            f"/items/{item.json()['id']}/precio", headers={"X-User-Id": "bench"}
+        )
+        primera_ms = (time.perf_counter() - inicio) * 1000
+        assert respuesta.status_code == 200, respuesta.text
+
+    limite = time.monotonic() + espera
+    while not flag_client.is_initialized() and time.monotonic() < limite:
+        time.sleep(0.05)
+
+    return {
+        "modo": modo,
+        "import_s": round(import_s, 3),
+        "primera_peticion_ms": round(primera_ms, 2),
+        "segundos_hasta_listo": flag_client.segundos_hasta_listo(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--espera",
+        type=float,
+        default=10.0,
+        help="segundos máximos esperando a que el proveedor esté listo",
+    )
+    parser.add_argument("--modo", choices=MODOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        devolver(_medir(args.modo, args.espera))
+        # El SDK de LaunchDarkly puede seguir reintentando en otros hilos
+        os._exit(0)
+
+    imprimir(por_modo("benchmarks.bench_arranque", MODOS, "--espera", args.espera))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark de carga masiva: `POST /items` item a item frente a
+`POST /items/bulk` con NDJSON, y exportación con `GET /items/export`.
+
+Reporta items/segundo de cada operación.
+
+Uso:
+    python -m benchmarks.bench_bulk --items 500000 --uno-a-uno 5000
+"""
+import argparse
+import json
+import time
+
+from benchmarks.comun import imprimir, usar_flags_locales
+
+
+def _ndjson(n_items: int, fraccion_invalidas: float) -> bytes:
+    cada = int(1 / fraccion_invalidas) if fraccion_invalidas else 0
+    lineas = []
+    for i in range(n_items):
+        if cada and i % cada == 0:
+            lineas.append('{"nombre": "roto", "precio": "no-es-numero"}')
+        else:
+            lineas.append(
+                json.dumps(
+                    {
+                        "nombre": f"producto-{i}",
+                        "descripcion": "importado en bloque",
+                        "precio": float(i % 1000) + 0.5,
+                    }
+                )
+            )
+    return ("\n".join(lineas) + "\n").encode()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, default=500_000)
+    parser.add_argument("--uno-a-uno", type=int, default=5000)
+    parser.add_argument("--invalidas", type=float, default=0.01)
+    args = parser.parse_args()
+
+    usar_flags_locales()
+
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    client = TestClient(app)
+    resultados = {}
+
+    inicio = time.perf_counter()
+    for i in range(args.uno_a_uno):
+        client.post("/items", json={"nombre": f"uno-{i}", "precio": 1.0})
+    duracion = time.perf_counter() - inicio
+    resultados["post_uno_a_uno"] = {
+        "items": args.uno_a_uno,
+        "segundos": round(duracion, 3),
+        "items_por_segundo": round(args.uno_a_uno / duracion),
+    }
+
+    cuerpo = _ndjson(args.items, args.invalidas)
+    inicio = time.perf_counter()
+    respuesta = client.post(
+        "/items/bulk",
+        content=cuerpo,
+        headers={"Content-Type": "application/x-ndjson"},
+    ).json()
+    duracion = time.perf_counter() - inicio
+    resultados["post_bulk"] = {
+        "lineas": args.items,
+        "aceptados": respuesta["aceptados"],
+        "rechazados": respuesta["rechazados"],
+        "segundos": round(duracion, 3),
+        "items_por_segundo": round(args.items / duracion),
+    }
+
+    inicio = time.perf_counter()
+    exportados = 0
+    with client.stream("GET", "/items/export") as r:
+        for linea in r.iter_lines():
+            if linea:
+                exportados += 1
+    duracion = time.perf_counter() - inicio
+    resultados["export"] = {
+        "items": exportados,
+        "segundos": round(duracion, 3),
+        "items_por_segundo": round(exportados / duracion),
+    }
+
+    imprimir(resultados)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Prueba de carga concurrente sobre el store: muchos hilos creando (y
+borrando) items a la vez, como hace el threadpool de FastAPI con los
+endpoints síncronos.
+
+Comprueba que no se pierden items ni se repiten IDs y reporta el throughput.
+Sale con código 1 si encuentra alguna inconsistencia.
+
+Uso:
+    python -m benchmarks.bench_concurrencia --hilos 32 --posts 5000
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from benchmarks.comun import imprimir, usar_flags_locales
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--hilos", type=int, default=32)
+    parser.add_argument("--posts", type=int, default=5000, help="POSTs por hilo")
+    parser.add_argument(
+        "--borrar-cada",
+        type=int,
+        default=10,
+        help="cada hilo borra uno de cada N items que crea (0 = nunca)",
+    )
+    args = parser.parse_args()
+
+    usar_flags_locales()
+
+    from app.main import crear_item, db, eliminar_item
+    from app.models import ItemBase
+
+    # Cambios de hilo mucho más frecuentes para provocar las carreras
+    sys.setswitchinterval(1e-6)
+
+    def trabajador(n_hilo: int) -> List[int]:
+        vivos = []
+        for i in range(args.posts):
+            nuevo = crear_item(
+                ItemBase(nombre=f"h{n_hilo}-{i}", precio=float(i % 100))
+            )
+            if args.borrar_cada and i % args.borrar_cada == 0:
+                eliminar_item(nuevo.id)
+            else:
+                vivos.append(nuevo.id)
+        return vivos
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.hilos) as pool:
+        resultados = list(pool.map(trabajador, range(args.hilos)))
+    duracion = time.perf_counter() - inicio
+
+    esperados = [item_id for ids in resultados for item_id in ids]
+    errores = []
+    if len(set(esperados)) != len(esperados):
+        errores.append("IDs duplicados")
+    if len(db) != len(esperados):
+        errores.append(f"len(db)={len(db)} pero se esperaban {len(esperados)}")
+    perdidos = [item_id for item_id in esperados if db.get(item_id) is None]
+    if perdidos:
+        errores.append(f"{len(perdidos)} items perdidos")
+    listados = [item.id for item in db.buscar()]
+    if listados != sorted(esperados):
+        errores.append("el listado no coincide con los items creados")
+
+    total_posts = args.hilos * args.posts
+    imprimir(
+        {
+            "hilos": args.hilos,
+            "posts": total_posts,
+            "items_vivos": len(esperados),
+            "segundos": round(duracion, 3),
+            "posts_por_segundo": round(total_posts / duracion),
+            "errores": errores,
+        }
+    )
+    sys.exit(1 if errores else 0)
+
+
+if __name__ == "__main__":
+    main()
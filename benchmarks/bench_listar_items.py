@@ -0,0 +1,116 @@
+"""
+Benchmark de GET /items: listado completo (comportamiento anterior) frente a
+paginación por cursor y streaming NDJSON.
+
+Cada modo se ejecuta en un subproceso propio para que el pico de RSS
+(ru_maxrss) de un modo no contamine al siguiente.
+
+Uso:
+    python -m benchmarks.bench_listar_items --items 200000 --repeticiones 3
+"""
+import argparse
+import statistics
+import time
+from typing import List
+
+from benchmarks.comun import (
+    devolver,
+    imprimir,
+    por_modo,
+    rss_actual_kb,
+    rss_pico_kb,
+    usar_flags_locales,
+)
+
+MODOS = ("completo", "pagina", "recorrido", "ndjson")
+
+
+def _ejecutar_modo(modo: str, n_items: int, repeticiones: int) -> dict:
+    usar_flags_locales()
+
+    from fastapi.testclient import TestClient
+
+    from app import database
+    from app.main import app
+    from app.models import Item
+
+    # Reproducimos el endpoint original para tener la línea base
+    @app.get("/bench/items-completo", response_model=List[Item])
+    def _listar_completo():
+        return list(database.db.buscar())
+
+    for _ in range(n_items):
+        item_id = database.db.next_id()
+        database.db.put(
+            Item(
+                id=item_id,
+                nombre=f"producto-{item_id}",
+                descripcion="descripcion de ejemplo",
+                precio=float(item_id % 1000),
+            )
+        )
+
+    client = TestClient(app)
+    rss_inicial_kb = rss_actual_kb()
+
+    def una_vez() -> int:
+        if modo == "completo":
+            return len(client.get("/bench/items-completo").json())
+        if modo == "pagina":
+            return len(client.get("/items", params={"limit": 1000}).json())
+        if modo == "recorrido":
+            total, params = 0, {"limit": 1000}
+            while True:
+                r = client.get("/items", params=params)
+                total += len(r.json())
+                siguiente = r.headers.get("X-Next-Cursor")
+                if siguiente is None:
+                    return total
+                params["cursor"] = siguiente
+        total = 0
+        with client.stream("GET", "/items", params={"formato": "ndjson"}) as r:
+            for linea in r.iter_lines():
+                if linea:
+                    total += 1
+        return total
+
+    tiempos = []
+    devueltos = 0
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        devueltos = una_vez()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    return {
+        "modo": modo,
+        "items": n_items,
+        "devueltos": devueltos,
+        "latencia_ms_mediana": round(statistics.median(tiempos), 2),
+        "latencia_ms_min": round(min(tiempos), 2),
+        "rss_pico_extra_mb": round(max(rss_pico_kb() - rss_inicial_kb, 0) / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--modo", choices=MODOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        devolver(_ejecutar_modo(args.modo, args.items, args.repeticiones))
+        return
+
+    imprimir(
+        por_modo(
+            "benchmarks.bench_listar_items",
+            MODOS,
+            "--items", args.items,
+            "--repeticiones", args.repeticiones,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
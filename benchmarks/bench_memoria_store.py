@@ -0,0 +1,83 @@
+"""
+Benchmark de memoria de los backends del store: "indexado" (un `Item` de
+pydantic por registro) frente a "columnar" (arrays y buffers compactos).
+
+Cada backend se carga en un subproceso propio y se mide el RSS antes y
+después de insertar los items, además del tiempo de carga y de unas
+lecturas por ID y por rango de precio.
+
+Uso:
+    python -m benchmarks.bench_memoria_store --items 1000000
+"""
+import argparse
+import gc
+import random
+import time
+
+from benchmarks.comun import devolver, imprimir, por_modo, rss_actual_kb
+
+BACKENDS = ("indexado", "columnar")
+
+
+def _medir_backend(backend: str, n_items: int) -> dict:
+    from app.database import crear_store
+    from app.models import Item
+
+    gc.collect()
+    rss_inicial_kb = rss_actual_kb()
+    store = crear_store(backend)
+
+    inicio = time.perf_counter()
+    for _ in range(n_items):
+        item_id = store.next_id()
+        store.put(
+            Item(
+                id=item_id,
+                nombre=f"producto-{item_id}",
+                descripcion=f"descripcion del producto {item_id}",
+                precio=float(item_id % 1000) + 0.99,
+            )
+        )
+    carga_s = time.perf_counter() - inicio
+    gc.collect()
+    rss_final_kb = rss_actual_kb()
+
+    azar = random.Random(42)
+    inicio = time.perf_counter()
+    for _ in range(10_000):
+        store.get(azar.randint(1, n_items))
+    get_us = (time.perf_counter() - inicio) / 10_000 * 1e6
+
+    inicio = time.perf_counter()
+    en_rango = sum(1 for _ in store.buscar(precio_min=100.0, precio_max=101.0))
+    rango_ms = (time.perf_counter() - inicio) * 1000
+
+    return {
+        "backend": backend,
+        "items": len(store),
+        "rss_mb": round((rss_final_kb - rss_inicial_kb) / 1024, 1),
+        "bytes_por_item": round((rss_final_kb - rss_inicial_kb) * 1024 / n_items),
+        "carga_s": round(carga_s, 2),
+        "get_us": round(get_us, 2),
+        "rango_precio_ms": round(rango_ms, 2),
+        "rango_precio_items": en_rango,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--modo", choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        devolver(_medir_backend(args.modo, args.items))
+        return
+
+    imprimir(
+        por_modo("benchmarks.bench_memoria_store", BACKENDS, "--items", args.items)
+    )
+
+
+if __name__ == "__main__":
+    main()
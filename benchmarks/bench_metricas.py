@@ -0,0 +1,91 @@
+"""
+Benchmark del coste de las métricas: la misma carga de peticiones con el
+middleware de métricas activado y desactivado (`METRICAS_HABILITADAS`),
+más el coste aislado de registrar una observación.
+
+Cada modo se ejecuta en un subproceso propio.
+
+Uso:
+    python -m benchmarks.bench_metricas --peticiones 20000
+"""
+import argparse
+import os
+import statistics
+import time
+import timeit
+
+from benchmarks.comun import devolver, imprimir, por_modo, usar_flags_locales
+
+
+def _medir(habilitadas: bool, peticiones: int, repeticiones: int) -> dict:
+    os.environ["METRICAS_HABILITADAS"] = "1" if habilitadas else "0"
+    usar_flags_locales()
+
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    client = TestClient(app)
+    respuesta = client.post("/items", json={"nombre": "bench", "precio": 1.0})
+    item_id = respuesta.json()["id"]
+    rutas = [f"/items/{item_id}", f"/items/{item_id}/precio"]
+
+    # Calentamiento
+    for i in range(200):
+        client.get(rutas[i % 2])
+
+    por_peticion_us = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for i in range(peticiones):
+            client.get(rutas[i % 2], headers={"X-User-Id": f"u{i % 50}"})
+        por_peticion_us.append((time.perf_counter() - inicio) / peticiones * 1e6)
+
+    return {
+        "metricas": habilitadas,
+        "peticiones": peticiones,
+        "us_por_peticion": round(statistics.median(por_peticion_us), 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--peticiones", type=int, default=20_000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--modo", choices=("on", "off"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        devolver(_medir(args.modo == "on", args.peticiones, args.repeticiones))
+        return
+
+    resultado_off, resultado_on = por_modo(
+        "benchmarks.bench_metricas",
+        ("off", "on"),
+        "--peticiones", args.peticiones,
+        "--repeticiones", args.repeticiones,
+    )
+
+    from app.metricas import Metricas
+
+    metricas = Metricas()
+    n = 200_000
+    observar_ns = timeit.timeit(
+        lambda: metricas.observar("GET", "/items/{item_id}", 200, 0.0012), number=n
+    ) / n * 1e9
+
+    sin = resultado_off["us_por_peticion"]
+    con = resultado_on["us_por_peticion"]
+    imprimir(
+        {
+            "sin_metricas_us": sin,
+            "con_metricas_us": con,
+            "sobrecoste_us": round(con - sin, 2),
+            "sobrecoste_pct": round((con - sin) / sin * 100, 2),
+            "observar_ns": round(observar_ns),
+        }
+    )
+
+
+if __name__ == "__main__":
+    main()
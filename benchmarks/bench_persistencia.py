@@ -0,0 +1,135 @@
+"""
+Benchmark del backend persistente (WAL + snapshots).
+
+- Escritura: throughput de altas con fsync por escritura ("siempre") frente
+  a group commit ("grupo"), con varios hilos escribiendo a la vez.
+- Arranque: tiempo de recuperación en frío de un directorio con
+  `--registros` items (y una fracción `--actualizaciones` de ellos
+  reescrita), desde snapshot + cola del log y solo desde el log.
+
+Uso:
+    python -m benchmarks.bench_persistencia --registros 1000000
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.database import crear_store
+from app.models import Item
+from app.persistencia import MODOS_SYNC, PersistentStore
+from benchmarks.comun import devolver, en_subproceso, imprimir
+
+_LOTE = 10_000
+
+
+def _item(item_id: int) -> Item:
+    return Item(
+        id=item_id,
+        nombre=f"producto-{item_id}",
+        descripcion=f"descripcion del producto {item_id}",
+        precio=float(item_id % 1000) + 0.99,
+    )
+
+
+def _medir_escritura(modo: str, escrituras: int, hilos: int, ventana_ms: float) -> dict:
+    directorio = tempfile.mkdtemp(prefix="bench-wal-")
+    try:
+        store = PersistentStore(
+            crear_store(), directorio, modo, ventana_ms, snapshot_cada=10**12
+        )
+
+        def trabajador(_: int) -> None:
+            for _ in range(escrituras // hilos):
+                store.put(_item(store.next_id()))
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            list(pool.map(trabajador, range(hilos)))
+        duracion = time.perf_counter() - inicio
+        store.cerrar()
+    finally:
+        shutil.rmtree(directorio)
+    total = escrituras // hilos * hilos
+    return {
+        "modo": modo,
+        "ventana_ms": ventana_ms if modo == "grupo" else None,
+        "hilos": hilos,
+        "escrituras": total,
+        "segundos": round(duracion, 3),
+        "escrituras_por_segundo": round(total / duracion),
+    }
+
+
+def _preparar(
+    directorio: str, registros: int, actualizaciones: float, con_snapshot: bool
+) -> None:
+    store = PersistentStore(crear_store(), directorio, "grupo", snapshot_cada=10**12)
+    # Con snapshot, el 90% queda compactado y el resto en la cola del log
+    en_snapshot = registros * 9 // 10
+    compactado = False
+    inicio = 0
+    while inicio < registros:
+        if con_snapshot and not compactado and inicio >= en_snapshot:
+            store.compactar()
+            compactado = True
+        fin = min(inicio + _LOTE, registros)
+        # Cortamos el lote justo en el punto del snapshot
+        if inicio < en_snapshot < fin:
+            fin = en_snapshot
+        ids = store.ids.reservar(fin - inicio)
+        store.put_many([_item(item_id) for item_id in ids])
+        # Reescrituras: en el log ocupan espacio, en el snapshot desaparecen
+        reescritos = ids[:int(len(ids) * actualizaciones)]
+        store.put_many([_item(item_id) for item_id in reescritos])
+        inicio = fin
+    store.cerrar()
+
+
+def _medir_arranque(directorio: str) -> dict:
+    inicio = time.perf_counter()
+    store = PersistentStore(crear_store(), directorio, "grupo")
+    total = time.perf_counter() - inicio
+    resultado = dict(store.recuperacion, segundos_totales=round(total, 3))
+    store.cerrar()
+    return resultado
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--registros", type=int, default=1_000_000)
+    parser.add_argument("--actualizaciones", type=float, default=0.5)
+    parser.add_argument("--escrituras", type=int, default=20_000)
+    parser.add_argument("--hilos", type=int, default=16)
+    parser.add_argument("--ventana-ms", type=float, default=0.0)
+    parser.add_argument("--arranque", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.arranque:
+        devolver(_medir_arranque(args.arranque))
+        return
+
+    resultados = {"escritura": [], "arranque": {}}
+    for modo in MODOS_SYNC:
+        for hilos in (1, args.hilos):
+            resultados["escritura"].append(
+                _medir_escritura(modo, args.escrituras, hilos, args.ventana_ms)
+            )
+
+    for nombre, con_snapshot in (("snapshot_y_cola", True), ("solo_log", False)):
+        directorio = tempfile.mkdtemp(prefix="bench-arranque-")
+        try:
+            _preparar(directorio, args.registros, args.actualizaciones, con_snapshot)
+            # Proceso nuevo: arranque realmente en frío
+            resultados["arranque"][nombre] = en_subproceso(
+                "benchmarks.bench_persistencia", "--arranque", directorio
+            )
+        finally:
+            shutil.rmtree(directorio)
+
+    imprimir(resultados)
+
+
+if __name__ == "__main__":
+    main()
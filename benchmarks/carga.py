@@ -0,0 +1,397 @@
+"""
+Prueba de carga asíncrona de la API con un sustituto de LaunchDarkly.
+
+`ejecutar` levanta la app en el propio proceso (o bajo uvicorn local con
+`--uvicorn`), carga `--items` items y lanza `--concurrencia` clientes
+asyncio contra `/items`, `/items/{id}` y `/items/{id}/precio` durante
+`--duracion` segundos. Guarda en JSON la latencia p50/p95/p99, el
+throughput, el pico de RSS y los aciertos de la caché de flags.
+
+La caché de flags está activa como en producción, así que
+`--latencia-flag-ms` solo pesa en los fallos de caché; con
+`--sin-cache-flags` cada `/precio` evalúa el proveedor.
+
+`comparar` enfrenta dos resultados y sale con código 1 si el nuevo empeora
+más de `--tolerancia` por ciento, para frenar una regresión antes de
+publicar la imagen. Si las dos ejecuciones no usaron la misma
+configuración se niega a compararlas (código 2) salvo con `--forzar`.
+
+Uso:
+    python -m benchmarks.carga ejecutar --salida base.json
+    python -m benchmarks.carga ejecutar --salida nuevo.json
+    python -m benchmarks.carga comparar base.json nuevo.json --tolerancia 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from app.flags import FlagProvider
+from benchmarks.comun import rss_pico_kb, usar_flags_locales
+
+# Peso de cada endpoint en la mezcla de peticiones
+MEZCLA = {"listar": 1, "obtener": 5, "precio": 4}
+
+
+class StubFlagProvider(FlagProvider):
+    """
+    Sustituto de LaunchDarkly para la prueba de carga: activa el flag para
+    una fracción estable de usuarios y puede simular la latencia del SDK.
+    """
+
+    nombre = "stub"
+
+    def __init__(self, fraccion: float = 0.5, latencia_ms: float = 0.0) -> None:
+        super().__init__()
+        self.fraccion = fraccion
+        self.latencia = latencia_ms / 1000
+        self._marcar_listo()
+
+    def variation(self, flag: str, user_key: str, default: Any) -> Any:
+        if self.latencia:
+            time.sleep(self.latencia)
+        cubeta = zlib.crc32(f"{flag}:{user_key}".encode()) % 1000
+        return cubeta < self.fraccion * 1000
+
+
+def _percentil(ordenados: List[float], p: float) -> Optional[float]:
+    if not ordenados:
+        return None
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return round(ordenados[indice], 3)
+
+
+def _resumen(latencias_ms: List[float], errores: int, duracion: float) -> dict:
+    ordenadas = sorted(latencias_ms)
+    return {
+        "peticiones": len(ordenadas),
+        "errores": errores,
+        "rps": round(len(ordenadas) / duracion, 1),
+        "p50_ms": _percentil(ordenadas, 50),
+        "p95_ms": _percentil(ordenadas, 95),
+        "p99_ms": _percentil(ordenadas, 99),
+        "max_ms": round(ordenadas[-1], 3) if ordenadas else None,
+    }
+
+
+def _commit_actual() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _datos(n_items: int) -> bytes:
+    lineas = (
+        json.dumps(
+            {
+                "nombre": f"producto-{i}",
+                "descripcion": "dato de la prueba de carga",
+                "precio": float(i % 500) + 0.99,
+            }
+        )
+        for i in range(n_items)
+    )
+    return ("\n".join(lineas) + "\n").encode()
+
+
+async def _cliente(
+    http,
+    ids: List[int],
+    fin: float,
+    latencias: Dict[str, List[float]],
+    errores: Dict[str, int],
+    semilla: int,
+) -> None:
+    azar = random.Random(semilla)
+    nombres = list(MEZCLA)
+    pesos = list(MEZCLA.values())
+    while time.perf_counter() < fin:
+        tipo = azar.choices(nombres, pesos)[0]
+        item_id = azar.choice(ids)
+        if tipo == "listar":
+            peticion = http.get("/items", params={"cursor": item_id, "limit": 50})
+        elif tipo == "obtener":
+            peticion = http.get(f"/items/{item_id}")
+        else:
+            usuario = f"usuario-{azar.randrange(1000)}"
+            peticion = http.get(
+                f"/items/{item_id}/precio", headers={"X-User-Id": usuario}
+            )
+        inicio = time.perf_counter()
+        try:
+            respuesta = await peticion
+            ok = respuesta.status_code < 400
+        except Exception:
+            ok = False
+        latencias[tipo].append((time.perf_counter() - inicio) * 1000)
+        if not ok:
+            errores[tipo] += 1
+
+
+async def _cache_flags(http) -> Dict[str, int]:
+    """Contadores de la caché de flags del servidor."""
+    respuesta = await http.get("/debug/launchdarkly")
+    respuesta.raise_for_status()
+    return respuesta.json()["cache_flags"]
+
+
+async def _lanzar_carga(http, args) -> Dict[str, Any]:
+    respuesta = await http.post(
+        "/items/bulk",
+        content=_datos(args.items),
+        headers={"Content-Type": "application/x-ndjson"},
+        timeout=None,
+    )
+    respuesta.raise_for_status()
+    exportados = (await http.get("/items/export")).text.splitlines()
+    ids = [json.loads(linea)["id"] for linea in exportados]
+    cache_antes = await _cache_flags(http)
+
+    latencias: Dict[str, List[float]] = {tipo: [] for tipo in MEZCLA}
+    errores: Dict[str, int] = {tipo: 0 for tipo in MEZCLA}
+    inicio = time.perf_counter()
+    fin = inicio + args.duracion
+    await asyncio.gather(
+        *(
+            _cliente(http, ids, fin, latencias, errores, semilla)
+            for semilla in range(args.concurrencia)
+        )
+    )
+    duracion = time.perf_counter() - inicio
+    cache_despues = await _cache_flags(http)
+
+    aciertos = cache_despues["aciertos"] - cache_antes["aciertos"]
+    fallos = cache_despues["fallos"] - cache_antes["fallos"]
+    todas = [ms for lista in latencias.values() for ms in lista]
+    return {
+        "total": _resumen(todas, sum(errores.values()), duracion),
+        "endpoints": {
+            tipo: _resumen(latencias[tipo], errores[tipo], duracion) for tipo in MEZCLA
+        },
+        "duracion_s": round(duracion, 2),
+        "cache_flags": {
+            "aciertos": aciertos,
+            "fallos": fallos,
+            "tasa_aciertos": (
+                round(aciertos / (aciertos + fallos), 3) if aciertos + fallos else None
+            ),
+        },
+    }
+
+
+async def _en_proceso(args) -> Dict[str, Any]:
+    import httpx
+
+    usar_flags_locales()
+    if args.sin_cache_flags:
+        # Con TTL 0 cada entrada caduca al guardarse: siempre fallo de caché
+        os.environ["FLAG_CACHE_TTL_S"] = "0"
+    import app.main as api
+
+    # Sustituimos el cliente de flags por el stub
+    api.flag_client = StubFlagProvider(args.fraccion_flag, args.latencia_flag_ms)
+
+    transporte = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://carga") as http:
+        resultado = await _lanzar_carga(http, args)
+    resultado["rss_pico_mb"] = round(rss_pico_kb() / 1024, 1)
+    return resultado
+
+
+async def _bajo_uvicorn(args) -> Dict[str, Any]:
+    import httpx
+
+    puerto = _puerto_libre()
+    # Fuera de proceso no podemos inyectar el stub: usamos flags locales
+    # con la misma fracción de usuarios activada
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(
+            {
+                "new-pricing-strategy": {
+                    "porcentaje": {"peso": args.fraccion_flag * 100, "valor": True},
+                    "valor": False,
+                }
+            },
+            f,
+        )
+        ruta_flags = f.name
+    entorno = dict(os.environ, FLAGS_PROVIDER="local", FLAGS_FILE=ruta_flags)
+    if args.sin_cache_flags:
+        entorno["FLAG_CACHE_TTL_S"] = "0"
+    servidor = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--port", str(puerto), "--log-level", "warning",
+        ],
+        env=entorno,
+    )
+    try:
+        url = f"http://127.0.0.1:{puerto}"
+        limites = httpx.Limits(max_connections=args.concurrencia)
+        async with httpx.AsyncClient(base_url=url, limits=limites) as http:
+            for _ in range(100):
+                try:
+                    await http.get("/debug/launchdarkly")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            resultado = await _lanzar_carga(http, args)
+        resultado["rss_pico_mb"] = round(rss_pico_kb(servidor.pid) / 1024, 1)
+        return resultado
+    finally:
+        servidor.terminate()
+        servidor.wait()
+        os.unlink(ruta_flags)
+
+
+def ejecutar(args) -> None:
+    corrida = _bajo_uvicorn(args) if args.uvicorn else _en_proceso(args)
+    resultado = asyncio.run(corrida)
+    resultado["config"] = {
+        "modo": "uvicorn" if args.uvicorn else "en_proceso",
+        "concurrencia": args.concurrencia,
+        "items": args.items,
+        "duracion_s": args.duracion,
+        "fraccion_flag": args.fraccion_flag,
+        "latencia_flag_ms": args.latencia_flag_ms,
+        "cache_flags": not args.sin_cache_flags,
+        "mezcla": MEZCLA,
+    }
+    resultado["commit"] = _commit_actual()
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    print(texto)
+
+    errores = resultado["total"]["errores"]
+    if args.max_errores is not None and errores > args.max_errores:
+        print(f"{errores} peticiones con error (máximo {args.max_errores})")
+        sys.exit(1)
+
+
+def comparar(args) -> None:
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.nuevo, encoding="utf-8") as f:
+        nuevo = json.load(f)
+
+    config_base = base.get("config", {})
+    config_nuevo = nuevo.get("config", {})
+    distintas = sorted(
+        clave
+        for clave in config_base.keys() | config_nuevo.keys()
+        if config_base.get(clave) != config_nuevo.get(clave)
+    )
+    if distintas:
+        for clave in distintas:
+            print(
+                f"config distinta: {clave}: "
+                f"{config_base.get(clave)!r} -> {config_nuevo.get(clave)!r}"
+            )
+        if not args.forzar:
+            print("Las ejecuciones no son comparables (usa --forzar para comparar)")
+            sys.exit(2)
+
+    tolerancia = args.tolerancia / 100
+    regresiones = []
+    filas = []
+
+    def revisar(nombre: str, antes, despues, mayor_es_peor: bool) -> None:
+        if antes is None or despues is None:
+            return
+        if antes == 0:
+            # Sin base relativa: cualquier empeoramiento cuenta (p. ej. errores)
+            cambio = 0.0 if despues == 0 else None
+            peor = despues > 0 if mayor_es_peor else despues < 0
+        else:
+            cambio = (despues - antes) / antes
+            peor = cambio > tolerancia if mayor_es_peor else cambio < -tolerancia
+        texto_cambio = "n/a" if cambio is None else f"{cambio * 100:+.1f}%"
+        filas.append(
+            f"{nombre:<28} {antes:>12} {despues:>12} {texto_cambio:>9}"
+            + ("  <- regresión" if peor else "")
+        )
+        if peor:
+            regresiones.append(nombre)
+
+    secciones = {"total": (base["total"], nuevo["total"])}
+    for tipo, datos in base.get("endpoints", {}).items():
+        if tipo in nuevo.get("endpoints", {}):
+            secciones[tipo] = (datos, nuevo["endpoints"][tipo])
+
+    for seccion, (antes, despues) in secciones.items():
+        for metrica in ("p50_ms", "p95_ms", "p99_ms"):
+            revisar(f"{seccion}.{metrica}", antes[metrica], despues[metrica], True)
+        revisar(f"{seccion}.rps", antes["rps"], despues["rps"], False)
+        revisar(f"{seccion}.errores", antes["errores"], despues["errores"], True)
+    revisar("rss_pico_mb", base.get("rss_pico_mb"), nuevo.get("rss_pico_mb"), True)
+
+    print(f"base: {base.get('commit')}  nuevo: {nuevo.get('commit')}")
+    print(f"{'métrica':<28} {'base':>12} {'nuevo':>12} {'cambio':>9}")
+    print("\n".join(filas))
+    if regresiones:
+        print(f"\nRegresiones por encima del {args.tolerancia}%:")
+        print(", ".join(regresiones))
+        sys.exit(1)
+    print(f"\nSin regresiones por encima del {args.tolerancia}%")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    p_ejecutar = subparsers.add_parser("ejecutar", help="lanza la prueba de carga")
+    p_ejecutar.add_argument("--concurrencia", type=int, default=32)
+    p_ejecutar.add_argument("--items", type=int, default=10_000)
+    p_ejecutar.add_argument("--duracion", type=float, default=10.0)
+    p_ejecutar.add_argument("--fraccion-flag", type=float, default=0.5)
+    p_ejecutar.add_argument("--latencia-flag-ms", type=float, default=0.0)
+    p_ejecutar.add_argument(
+        "--sin-cache-flags",
+        action="store_true",
+        help="desactiva la caché de flags: cada /precio evalúa el proveedor",
+    )
+    p_ejecutar.add_argument("--uvicorn", action="store_true")
+    p_ejecutar.add_argument("--max-errores", type=int, help="falla si hay más")
+    p_ejecutar.add_argument("--salida", help="archivo JSON para el resultado")
+    p_ejecutar.set_defaults(funcion=ejecutar)
+
+    p_comparar = subparsers.add_parser("comparar", help="compara dos resultados")
+    p_comparar.add_argument("base")
+    p_comparar.add_argument("nuevo")
+    p_comparar.add_argument("--tolerancia", type=float, default=10.0)
+    p_comparar.add_argument(
+        "--forzar",
+        action="store_true",
+        help="compara aunque la configuración de las ejecuciones sea distinta",
+    )
+    p_comparar.set_defaults(funcion=comparar)
+
+    args = parser.parse_args()
+    args.funcion(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Utilidades compartidas por los benchmarks: flags locales, lectura de RSS y
+ejecución de cada modo en un subproceso propio.
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+from typing import Any, Iterable, List, Optional
+
+
+def usar_flags_locales() -> None:
+    """Flags locales: medimos la app, no la conexión con LaunchDarkly."""
+    os.environ.setdefault("FLAGS_PROVIDER", "local")
+
+
+def rss_actual_kb() -> int:
+    with open("/proc/self/statm") as f:
+        paginas = int(f.read().split()[1])
+    return paginas * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def rss_pico_kb(pid: Optional[int] = None) -> int:
+    """Pico de RSS de este proceso o, si se indica, del proceso `pid`."""
+    if pid is None:
+        # En Linux ru_maxrss viene en KB
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with open(f"/proc/{pid}/status") as f:
+        for linea in f:
+            if linea.startswith("VmHWM:"):
+                return int(linea.split()[1])
+    return 0
+
+
+def en_subproceso(modulo: str, *argumentos: Any) -> Any:
+    """
+    Ejecuta `python -m modulo argumentos...` y devuelve el JSON que imprime
+    en su última línea.
+
+    Un proceso nuevo por medición evita que el pico de RSS, los imports o
+    el estado de una medición contaminen a la siguiente.
+    """
+    salida = subprocess.run(
+        [sys.executable, "-m", modulo, *map(str, argumentos)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def por_modo(modulo: str, modos: Iterable[str], *argumentos: Any) -> List[Any]:
+    """Mide cada modo en su subproceso, pasándolo en la opción oculta `--modo`."""
+    return [en_subproceso(modulo, "--modo", modo, *argumentos) for modo in modos]
+
+
+def devolver(resultado: Any) -> None:
+    """Resultado de un subproceso de medición: JSON en una sola línea."""
+    print(json.dumps(resultado))
+    sys.stdout.flush()
+
+
+def imprimir(resultado: Any) -> None:
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
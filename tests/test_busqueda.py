@@ -0,0 +1,92 @@
+from itertools import islice
+
+import pytest
+
+from app.columnar import ColumnarStore
+from app.database import IndexedStore, crear_store
+from app.models import Item
+
+N_ITEMS = 20_000
+# El último 5% de los IDs forma un bloque con nombre y precio propios, como
+# una importación masiva
+INICIO_BLOQUE = N_ITEMS * 95 // 100
+
+
+def _cargar(store) -> None:
+    ids = store.ids.reservar(N_ITEMS)
+    store.put_many(
+        [
+            Item(
+                id=i,
+                nombre=f"nuevo-{i}" if i > INICIO_BLOQUE else f"viejo-{i}",
+                precio=5000.0 if i > INICIO_BLOQUE else float(i % 1000),
+            )
+            for i in ids
+        ]
+    )
+
+
+@pytest.fixture(params=["indexado", "columnar"])
+def store(request):
+    store = crear_store(request.param)
+    _cargar(store)
+    return store
+
+
+@pytest.mark.parametrize(
+    "filtros",
+    [
+        {"nombre_prefijo": "nuevo"},
+        {"precio_min": 5000.0},
+        {"nombre_prefijo": "viejo", "precio_max": 10.0},
+        {"precio_min": 0.0},
+        {},
+    ],
+)
+@pytest.mark.parametrize("desde_id", [0, INICIO_BLOQUE - 5, N_ITEMS - 3])
+def test_limite_no_cambia_resultados(store, filtros, desde_id):
+    esperados = list(islice(store.buscar(desde_id, **filtros), 101))
+    obtenidos = list(islice(store.buscar(desde_id, limite=101, **filtros), 101))
+    assert obtenidos == esperados
+
+
+def test_resultados_agrupados_no_recorren_todo_el_store():
+    store = IndexedStore()
+    _cargar(store)
+    recorridos = 0
+    recorrer_ids = store._recorrer_ids
+
+    def contando(desde_id):
+        nonlocal recorridos
+        for item_id in recorrer_ids(desde_id):
+            recorridos += 1
+            yield item_id
+
+    store._recorrer_ids = contando
+    pagina = list(islice(store.buscar(0, "nuevo", limite=11), 11))
+
+    assert [item.id for item in pagina] == list(
+        range(INICIO_BLOQUE + 1, INICIO_BLOQUE + 12)
+    )
+    # Sin tope, recorrería los 19.000 IDs anteriores al bloque
+    assert recorridos < N_ITEMS // 4
+
+
+def test_resultados_agrupados_no_recorren_todo_el_store_columnar():
+    store = ColumnarStore()
+    _cargar(store)
+    revisadas = 0
+    cumple = store._cumple
+
+    def contando(*argumentos):
+        nonlocal revisadas
+        revisadas += 1
+        return cumple(*argumentos)
+
+    store._cumple = contando
+    pagina = list(islice(store.buscar(0, "nuevo", limite=11), 11))
+
+    assert [item.id for item in pagina] == list(
+        range(INICIO_BLOQUE + 1, INICIO_BLOQUE + 12)
+    )
+    assert revisadas < N_ITEMS // 4
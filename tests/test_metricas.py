@@ -0,0 +1,49 @@
+import gc
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.metricas import Metricas, MetricasMiddleware
+
+
+def test_hilos_terminados_no_acumulan_shards():
+    metricas = Metricas()
+
+    def peticion() -> None:
+        metricas.observar("GET", "/items", 200, 0.001)
+        metricas.incrementar("flag_evaluaciones_total")
+
+    for _ in range(10):
+        hilos = [threading.Thread(target=peticion) for _ in range(100)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+    del hilos, hilo
+    gc.collect()
+
+    assert len(metricas._shards) == 0
+    texto = metricas.exportar()
+    assert 'route="/items",status="200"} 1000' in texto
+    assert "flag_evaluaciones_total 1000" in texto
+
+
+def test_metodos_no_estandar_se_agrupan():
+    metricas = Metricas()
+    app = FastAPI()
+    app.add_middleware(MetricasMiddleware, metricas=metricas)
+
+    @app.get("/ping")
+    def ping():
+        return "pong"
+
+    with TestClient(app) as client:
+        client.get("/ping")
+        client.request("PROPFIND", "/ping")
+        client.request("XYZZY", "/otra")
+
+    texto = metricas.exportar()
+    assert 'method="GET",route="/ping",status="200"' in texto
+    assert 'method="OTHER"' in texto
+    assert "PROPFIND" not in texto and "XYZZY" not in texto
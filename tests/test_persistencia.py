@@ -0,0 +1,139 @@
+import os
+import random
+import threading
+
+import pytest
+
+from app.database import crear_store
+from app.models import Item
+from app.persistencia import PersistentStore
+
+
+@pytest.fixture(params=["indexado", "columnar"])
+def abrir(request, tmp_path):
+    """Abre (o reabre) el store persistente en el mismo directorio."""
+
+    def abrir(**opciones):
+        return PersistentStore(crear_store(request.param), str(tmp_path), **opciones)
+
+    return abrir
+
+
+def _item(item_id: int) -> Item:
+    return Item(
+        id=item_id,
+        nombre=f"item-{item_id}",
+        descripcion=None if item_id % 2 else "descripción",
+        precio=item_id / 4,
+    )
+
+
+def _contenido(store) -> dict:
+    return {item.id: item for item in store.buscar()}
+
+
+def _ultimo_wal(directorio) -> str:
+    wals = [nombre for nombre in os.listdir(directorio) if nombre.startswith("wal")]
+    return os.path.join(directorio, max(wals))
+
+
+def test_reproduce_altas_y_bajas(abrir):
+    store = abrir()
+    for item_id in range(1, 11):
+        store.put(_item(item_id))
+    store.delete(3)
+    store.delete(7)
+    store.put(_item(3))
+    esperado = _contenido(store)
+    store.cerrar()
+
+    recuperado = abrir()
+    assert _contenido(recuperado) == esperado
+    assert 7 not in _contenido(recuperado)
+    recuperado.cerrar()
+
+
+def test_trunca_cola_incompleta(abrir, tmp_path):
+    store = abrir()
+    store.put_many([_item(item_id) for item_id in range(1, 6)])
+    store.cerrar()
+    ruta = _ultimo_wal(tmp_path)
+    tamano = os.path.getsize(ruta)
+    with open(ruta, "ab") as f:
+        f.write(b"\x01\x02\x03 escritura a medias")
+
+    recuperado = abrir()
+    assert set(_contenido(recuperado)) == {1, 2, 3, 4, 5}
+    assert os.path.getsize(ruta) == tamano
+    # Lo escrito después de truncar se recupera en el siguiente arranque
+    recuperado.put(_item(6))
+    recuperado.cerrar()
+    otra_vez = abrir()
+    assert set(_contenido(otra_vez)) == {1, 2, 3, 4, 5, 6}
+    otra_vez.cerrar()
+
+
+def test_snapshot_y_cola(abrir):
+    store = abrir()
+    store.put_many([_item(item_id) for item_id in range(1, 101)])
+    store.compactar()
+    store.delete(50)
+    store.put(_item(101))
+    esperado = _contenido(store)
+    store.cerrar()
+
+    recuperado = abrir()
+    assert _contenido(recuperado) == esperado
+    assert recuperado.recuperacion["registros_snapshot"] == 100
+    assert recuperado.recuperacion["registros_log"] == 2
+    recuperado.cerrar()
+
+
+def test_ids_no_se_repiten_tras_reiniciar(abrir):
+    store = abrir()
+    ids = [store.next_id() for _ in range(5)]
+    store.put(_item(ids[-1]))
+    store.delete(ids[-1])
+    store.cerrar()
+
+    recuperado = abrir()
+    assert recuperado.next_id() > ids[-1]
+    recuperado.cerrar()
+
+
+def test_compactacion_con_escrituras_concurrentes(abrir, tmp_path):
+    store = abrir(snapshot_cada=3000)
+    vivos = {}
+    lock = threading.Lock()
+
+    def escritor(semilla: int) -> None:
+        aleatorio = random.Random(semilla)
+        propios = []
+        for _ in range(1500):
+            if propios and aleatorio.random() < 0.2:
+                item_id = propios.pop(aleatorio.randrange(len(propios)))
+                assert store.delete(item_id)
+                with lock:
+                    del vivos[item_id]
+            else:
+                item = _item(store.next_id())
+                store.put(item)
+                propios.append(item.id)
+                with lock:
+                    vivos[item.id] = item
+
+    hilos = [threading.Thread(target=escritor, args=(n,)) for n in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    ultimo = store.ids.ultimo
+    store.cerrar()
+    assert any(nombre.startswith("snapshot") for nombre in os.listdir(tmp_path))
+    with open(_ultimo_wal(tmp_path), "ab") as f:
+        f.write(random.Random(0).randbytes(64))
+
+    recuperado = abrir()
+    assert _contenido(recuperado) == vivos
+    assert recuperado.ids.ultimo >= ultimo
+    recuperado.cerrar()